@@ -0,0 +1,465 @@
+import os
+import re
+import pickle
+import hashlib
+import fcntl
+import threading
+from collections import deque, OrderedDict
+
+# Spanish vowel accents and other special characters (lower and upper case) replaced by accent_rem:
+ACCENTS = (
+    ("á", "a"),
+    ("é", "e"),
+    ("í", "i"),
+    ("ó", "o"),
+    ("ú", "u"),
+    ("ñ", 'n'),
+    ("à", "a"),
+    ("è", "e"),
+    ("ì", "i"),
+    ("ò", "o"),
+    ("ù", "u"),
+    ("ä", 'a'),
+    ("ë", "e"),
+    ("ï", "i"),
+    ("ö", "o"),
+    ("ü", "u"),
+)
+ACCENTS_TABLE = str.maketrans(dict([(a, b) for a, b in ACCENTS] + [(a.upper(), b.upper()) for a, b in ACCENTS]))
+DIGITS_TABLE = str.maketrans('', '', '0123456789')
+
+# Urls (http in advance), pictures, hashtags and mentions, removed in this order:
+REMOVALS = (
+    re.compile(r'http.*'),
+    re.compile(r'pic.twitter\S+'),
+    re.compile(r'#\S+'),
+    re.compile(r'@\S+'),
+)
+# Special characters:
+SPECIALS = re.compile(r"(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)")
+
+
+# spaCy models loaded on demand (spacy is only imported when a model is needed):
+NLP_MODELS = {}
+
+def load_nlp(model = 'es_core_news_sm', exclude = ()):
+    '''
+    Function to load a spaCy model the first time it's needed, then reuse it.
+    params:
+        - model: spaCy model name.
+        - exclude: pipeline components not loaded.
+    Output: spaCy language pipeline.
+    '''
+    key = (model, tuple(exclude))
+    if key not in NLP_MODELS:
+        import spacy
+        NLP_MODELS[key] = spacy.load(model, exclude = list(exclude))
+    return(NLP_MODELS[key])
+
+
+def accent_rem(name):
+    '''
+    Function to remove accents from an alphanumeric string:
+    params:
+        - name: character string.
+    Output: string without accents.
+    '''
+    return(name.translate(ACCENTS_TABLE))
+
+
+class EcoMatcher:
+    '''
+    Multi-term matcher (Aho-Corasick automaton) built once from the filtering words list,
+    it finds all the terms of a text on one pass. On 'substring' mode the terms are found
+    anywhere in the text, on 'token' mode only as whole words (or phrases) of the text.
+    '''
+    def __init__(self,
+                terms = [],
+                mode = 'substring'
+                ):
+
+        if mode not in ('substring', 'token'):
+            raise ValueError('Unknown matching mode: ' + str(mode))
+
+        #Local parameters
+        self.mode = mode
+        self.terms = []
+        self.always = False
+
+        #Automaton: transitions, failure links and terms (index, length) ending on each state
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+        for term in terms:
+            if not isinstance(term, str) or term in self.terms:
+                continue
+            self.terms.append(term)
+            if term == '':
+                #The empty term is on every text, but it is not a whole word:
+                self.always = mode == 'substring'
+                continue
+            state = 0
+            for char in term:
+                nxt = self.goto[state].get(char)
+                if nxt is None:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    nxt = len(self.goto) - 1
+                    self.goto[state][char] = nxt
+                state = nxt
+            self.out[state].append((len(self.terms) - 1, len(term)))
+
+        #Failure links on breadth first order:
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                fail = self.goto[fail].get(char, 0)
+                self.fail[nxt] = fail if fail != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter_matches(self, text):
+        '''
+        Generator of the terms found on a text.
+        params:
+            - text: the document, words separated by single spaces on 'token' mode.
+        output: index on the terms list of each term found (with repetitions).
+        '''
+        goto, fail, out = self.goto, self.fail, self.out
+        token = self.mode == 'token'
+        size = len(text)
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for idx, length in out[state]:
+                if token:
+                    start = i - length + 1
+                    if (start > 0 and text[start - 1] != ' ') or (i + 1 < size and text[i + 1] != ' '):
+                        continue
+                yield idx
+
+    def search(self, text):
+        '''
+        Function to check if a text contains any term.
+        params:
+            - text: the document.
+        output: True if any term is found.
+        '''
+        if self.always:
+            return True
+        for idx in self.iter_matches(text):
+            return True
+        return False
+
+    def find(self, text):
+        '''
+        Function to find the terms of a text.
+        params:
+            - text: the document.
+        output: list of the terms found, on the terms list order.
+        '''
+        found = set(self.iter_matches(text))
+        if self.always:
+            found.add(self.terms.index(''))
+        return [self.terms[idx] for idx in sorted(found)]
+
+
+class TweetCleaner:
+    '''
+    Tweets text cleaning with the stopwords and filtering words compiled once:
+    urls, pictures, hashtags, mentions, accents, special characters, numbers,
+    stopwords and words out of length are removed, and tweets without any
+    filtering word are emptied.
+    '''
+    def __init__(self,
+                stopw = [],
+                ecol = [],
+                mode = 'substring'
+                ):
+
+        #Local parameters
+        self.stopw = frozenset(stopw)
+        self.matcher = EcoMatcher(ecol, mode)
+
+    def normalize(self, tweet):
+        '''
+        Function to treat the text of a tweet, without the filtering words check.
+        params:
+            - tweet: the document itself.
+        output: the tweet treated.
+        '''
+        # Remove urls, pictures, mentions and hastags.
+        for pattern in REMOVALS:
+            tweet = pattern.sub('', tweet)
+        # Remove spanish vowel accents, special characters and numbers, lower captions.
+        tweet = SPECIALS.sub(' ', tweet.translate(ACCENTS_TABLE)).lower().translate(DIGITS_TABLE)
+        # Remove stopwords and filter words length (<1 and >15) on one pass.
+        return ' '.join([word for word in tweet.split() if 1 < len(word) <= 15 and word not in self.stopw])
+
+    def clean(self, tweet):
+        '''
+        Function to treat the text of a tweet.
+        params:
+            - tweet: the document itself.
+        output: the tweet cleaned, empty if it has no filtering word.
+        '''
+        tweet = self.normalize(tweet)
+        return tweet if self.matcher.search(tweet) else ''
+
+    def clean_terms(self, tweet):
+        '''
+        Function to treat the text of a tweet and find its filtering words.
+        params:
+            - tweet: the document itself.
+        output: tuple (the tweet cleaned, list of filtering words found).
+        '''
+        tweet = self.normalize(tweet)
+        terms = self.matcher.find(tweet)
+        return (tweet if len(terms) > 0 else '', terms)
+
+    def clean_many(self, tweets, terms = False):
+        '''
+        Function to treat the text of several tweets.
+        params:
+            - tweets: iterable of documents.
+            - terms: if True, the filtering words found are returned too.
+        output: list of the tweets cleaned, or tuple (list of the tweets cleaned,
+                list of the filtering words found on each tweet) if terms is True.
+        '''
+        if not terms:
+            clean = self.clean
+            return [clean(tweet) for tweet in tweets]
+        clean_terms = self.clean_terms
+        results = [clean_terms(tweet) for tweet in tweets]
+        return ([tweet for tweet, found in results], [found for tweet, found in results])
+
+
+class Lemmatizer:
+    '''
+    Lemmatization of cleaned texts, token by token: the lemmas of the tokens already seen
+    are taken from a bounded LRU cache persisted on disk, and the new tokens are lemmatized
+    by batches with spaCy nlp.pipe, loaded without the components lemmas don't need.
+    '''
+    def __init__(self,
+                model = 'es_core_news_sm',
+                cache_path = None,
+                cache_size = 200000,
+                batch_size = 1000,
+                n_process = 1,
+                save_every = 10000,
+                exclude = ('parser', 'ner', 'senter')
+                ):
+
+        #Local parameters
+        self.model = model
+        self.cache_path = cache_path
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.save_every = save_every
+        self.exclude = tuple(exclude)
+
+        #Token -> lemma cache, least recently used first:
+        self.cache = OrderedDict()
+        self.added = 0
+        self.learned = None
+        self.lock = threading.RLock()
+        if cache_path is not None and os.path.isfile(cache_path):
+            with open(cache_path, 'rb') as f:
+                self.cache.update(pickle.load(f)[-cache_size:])
+
+    def __getstate__(self):
+        '''
+        Function to pickle the instance for worker processes, without its lock.
+        '''
+        state = self.__dict__.copy()
+        state['lock'] = None
+        return(state)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def lemmatize_tokens(self, tokens):
+        '''
+        Function to lemmatize tokens with spaCy, by batches.
+        params:
+            - tokens: list of tokens.
+        Output: list of the lemmas of the tokens.
+        '''
+        nlp = load_nlp(self.model, self.exclude)
+        return [' '.join([tok.lemma_.lower() for tok in doc]) 
+                for doc in nlp.pipe(tokens, batch_size = self.batch_size, n_process = self.n_process)]
+
+    def lemmatize_many(self, texts):
+        '''
+        Function to lemmatize several texts, words separated by spaces.
+        params:
+            - texts: iterable of texts.
+        Output: list of the texts lemmatized.
+        '''
+        texts = [text.split() for text in texts]
+        with self.lock:
+            cache = self.cache
+            new = list(set([token for tokens in texts for token in tokens if token not in cache]))
+            if len(new) > 0:
+                for token, lemma in zip(new, self.lemmatize_tokens(new)):
+                    cache[token] = lemma
+                    if self.learned is not None:
+                        self.learned.append((token, lemma))
+                self.added += len(new)
+
+            lemmas = []
+            for tokens in texts:
+                for token in tokens:
+                    cache.move_to_end(token)
+                lemmas.append(' '.join([cache[token] for token in tokens]))
+
+            #Evict the least recently used tokens:
+            while len(cache) > self.cache_size:
+                cache.popitem(last = False)
+
+            if self.cache_path is not None and self.added >= self.save_every:
+                self.save()
+        return lemmas
+
+    def learn(self):
+        '''
+        Function to start keeping the new lemmas, to be shipped to another process
+        (worker processes don't persist the cache, the parent process does).
+        '''
+        with self.lock:
+            self.cache_path = None
+            self.learned = []
+
+    def drain(self):
+        '''
+        Function to get the new lemmas kept since the last call.
+        Output: list of (token, lemma) pairs.
+        '''
+        with self.lock:
+            learned = self.learned or []
+            if self.learned is not None:
+                self.learned = []
+            return(learned)
+
+    def update(self, pairs):
+        '''
+        Function to add lemmas learned on another process to the cache.
+        params:
+            - pairs: list of (token, lemma) pairs.
+        '''
+        if len(pairs) == 0:
+            return
+        with self.lock:
+            for token, lemma in pairs:
+                self.cache[token] = lemma
+                self.cache.move_to_end(token)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last = False)
+            self.added += len(pairs)
+            if self.cache_path is not None and self.added >= self.save_every:
+                self.save()
+
+    def save(self):
+        '''
+        Function to persist the cache on disk, if it learned new lemmas: merged with the
+        cache on disk (other processes may have saved theirs), written on a temporal file,
+        then replaced, under a lock file.
+        '''
+        if self.cache_path is None or self.added == 0:
+            return
+        with self.lock:
+            with open(self.cache_path + '.lock', 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+                #The lemmas on disk first, so this process' ones are the most recent:
+                merged = OrderedDict()
+                if os.path.isfile(self.cache_path):
+                    try:
+                        with open(self.cache_path, 'rb') as f:
+                            merged.update(pickle.load(f))
+                    except Exception:
+                        pass
+                for token, lemma in self.cache.items():
+                    merged.pop(token, None)
+                    merged[token] = lemma
+                while len(merged) > self.cache_size:
+                    merged.popitem(last = False)
+
+                temp_path = self.cache_path + '.' + str(os.getpid()) + '.tmp'
+                with open(temp_path, 'wb') as f:
+                    pickle.dump(list(merged.items()), f, protocol = pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, self.cache_path)
+            self.cache = merged
+            self.added = 0
+
+
+def file_signature(path):
+    '''
+    Function to get the signature of a lexicon source file.
+    params:
+        - path: relative path to the file.
+    Output: tuple (size, mtime in ns, sha1 of the content).
+    '''
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return (stat.st_size, stat.st_mtime_ns, digest)
+
+
+def load_artifact(path, sources, key):
+    '''
+    Function to load a compiled lexicons artifact if it's still valid: built with the
+    same key and from the same sources (same size and mtime, or same content hash).
+    params:
+        - path: relative path to the artifact.
+        - sources: list of paths of the source files.
+        - key: compilation settings the artifact must have been built with.
+    Output: the artifact payload or None if it has to be compiled again.
+    '''
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            artifact = pickle.load(f)
+    except Exception:
+        return None
+    if artifact.get('key') != key or [src for src, sign in artifact['sources']] != list(sources):
+        return None
+    for src, (size, mtime, digest) in artifact['sources']:
+        if not os.path.isfile(src):
+            return None
+        stat = os.stat(src)
+        if stat.st_size != size:
+            return None
+        if stat.st_mtime_ns != mtime and file_signature(src)[2] != digest:
+            return None
+    return artifact['payload']
+
+
+def save_artifact(path, sources, key, payload):
+    '''
+    Function to save a compiled lexicons artifact with the signature of its sources
+    (written on a temporal file, then replaced).
+    params:
+        - path: relative path to the artifact.
+        - sources: list of paths of the source files.
+        - key: compilation settings of the artifact.
+        - payload: compiled lexicons.
+    '''
+    artifact = {'key': key, 
+                'sources': [(src, file_signature(src)) for src in sources], 
+                'payload': payload}
+    temp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump(artifact, f, protocol = pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
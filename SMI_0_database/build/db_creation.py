@@ -1,12 +1,21 @@
+from startup import StartupReport
+startup = StartupReport()
+
 import os
 import logging
 from datetime import datetime
 from datetime import datetime as dt
+import json
+startup.mark('Import standard library')
 from tweepy import API, OAuthHandler
+startup.mark('Import tweepy')
 import psycopg2
-import json
+startup.mark('Import psycopg2')
 
 from utils import *
+from fake_api import FakeAPI
+from fake_web import FakeWeb
+startup.mark('Import utils (pandas, bs4, cleaning)')
 
 ## GLOBAL Params:
 
@@ -43,6 +52,30 @@ corpus_table = app_config['corpus_table']
 munlist_table = app_config['munlist_table']
 app_name = app_config['app_name']
 
+# Bulk loading:
+batch_size = app_config.get('batch_size', 10000)
+tweets_workers = app_config.get('tweets_workers', os.cpu_count())
+
+# Filtering words matching ('substring' or 'token'):
+ecofilter_mode = app_config.get('ecofilter_mode', 'substring')
+
+# Processes cleaning the corpus and backups texts, one pool for the whole load (batches
+# of less than text_parallel_min texts are cleaned in process):
+text_workers = app_config.get('text_workers', os.cpu_count())
+text_parallel_min = app_config.get('text_parallel_min', 20000)
+
+# Lemmatization of the cleaned texts (off by default), with a token -> lemma cache on disk:
+lemmatize = app_config.get('lemmatize', False)
+lemma_cache_size = app_config.get('lemma_cache_size', 200000)
+lemma_batch_size = app_config.get('lemma_batch_size', 1000)
+lemma_processes = app_config.get('lemma_processes', 1)
+
+# Seed users pages fetched concurrently, revalidated against an on-disk HTTP cache:
+http_workers = app_config.get('http_workers', 8)
+http_cache_path = temp_data_path + 'db_creation/http_cache/'
+
+startup.mark('Load config')
+
 ## Check and create directories:
 
 if not os.path.isdir(logs_path):
@@ -67,6 +100,15 @@ auth = OAuthHandler(consumer_key, consumer_secret)
 auth.set_access_token(access_token, access_secret)
 api = API(auth, wait_on_rate_limit=True)
 
+# Offline stand-in of the API (benchmarks and local runs):
+if app_config.get('fake_api', False):
+    api = FakeAPI(latency=app_config.get('fake_api_latency', 0.2))
+
+# Offline stand-in of the seed users pages:
+if app_config.get('fake_web', False):
+    urls = FakeWeb(n_pages=app_config.get('fake_web_pages', 10)).start()
+startup.mark('Twitter API connection')
+
 ## Logger initialization:
 
 api_logger = logging.getLogger(__file__)
@@ -79,6 +121,7 @@ logging.basicConfig(
         logging.FileHandler(os.path.join(logs_path, app_name, file_name)),
         logging.StreamHandler()
     ])
+startup.mark('Logger initialization')
 
 try:
 
@@ -104,33 +147,41 @@ try:
     cur = conn.cursor()
 
     api_logger.info('Database jobs: PostgresSQL connection ready.')
+    startup.mark('Database connection')
 
     #Create class instance:
+    lemmatizer = None
+    if lemmatize:
+        lemmatizer = Lemmatizer(cache_path=temp_data_path + 'utils/lemma_cache.pkl', cache_size=lemma_cache_size, 
+                                batch_size=lemma_batch_size, n_process=lemma_processes)
     dbcreate = DatabaseCreation(queries_path, conn, schema, 
                                 api_logger, api, urls, headers, ini_users_dict, 
-                                users_table, corpus_table, munlist_table)
+                                users_table, corpus_table, munlist_table, batch_size,
+                                ecofilter_mode, text_workers, lemmatizer,
+                                http_cache_path, http_workers, text_parallel_min = text_parallel_min)
 
     ## Check schema and tables:
     dbcreate.db_init()
+    startup.mark('Check schema and tables')
 
     ## Check backups, tables and fill database:
 
     api_logger.info('Data jobs: Load auxiliar data from files.')
 
-    ##Load stopwords:
+    ##Load stopwords and ecolist (compiled lexicons artifact):
     stops = ['/db_stopwords_spanish_1.txt', '/db_stopwords_spanish_2.txt']
-    stopw = dbcreate.get_stops(temp_data_path + 'utils', stops)
-    ##Load ecolist:
     files = ['/ecofilter.xlsx']
-    ecolist = dbcreate.get_ecofilter(temp_data_path + 'utils', files)
+    stopw, ecolist = dbcreate.get_lexicons(temp_data_path + 'utils', stops, files)
+    startup.mark('Load stopwords and ecofilter')
+    startup.report(api_logger)
 
     ## Insert municipalities:
     dbcreate.insert_munlist(temp_data_path)
 
-    # Get municipalities from DB:
-    db_munlist = dbcreate.fetchall_SQL(queries_path + 'SMI_munlist_query.sql')
-    munlist = pd.DataFrame(db_munlist, columns = ['location'])['location'].tolist()
-    db_munlist = [dbcreate.accent_rem(mun.lower().replace(',', '')) for mun in munlist]
+    # Get municipalities (normalized on DB) and build their matcher:
+    db_munlist = dbcreate.fetchall_rows(queries_path + 'SMI_munlist_lookup.sql')
+    munlist = pd.DataFrame(db_munlist, columns = ['munid', 'location_norm', 'province', 'region'])
+    db_munlist = LocationMatcher(munlist['location_norm'].tolist(), munlist['munid'].tolist(), normalized = True)
 
     ## Insert users:
     dbcreate.insert_users(queries_path, temp_data_path, db_users_bkp, db_munlist, db_today)
@@ -139,7 +190,12 @@ try:
     dbcreate.insert_corpus(temp_data_path, stopw, ecolist)
 
     ## Insert Tweets:
-    dbcreate.insert_tweets(temp_data_path, stopw, ecolist)
+    dbcreate.insert_tweets(temp_data_path, stopw, ecolist, tweets_workers)
+    dbcreate.close_clean_pool()
+
+    ## Persist the lemmas cache (if it learned new lemmas, merged with the cache on disk):
+    if lemmatizer is not None:
+        lemmatizer.save()
 
 except (Exception, psycopg2.DatabaseError) as error:
     logging.exception(error)
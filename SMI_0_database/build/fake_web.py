@@ -0,0 +1,103 @@
+import hashlib
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeWeb:
+    '''
+    Offline stand-in of the seed users ranking pages for benchmarks and local runs:
+    serves generated pages with the layout of the ranking site, answering the
+    conditional requests (ETag / Last-Modified) with 304.
+    '''
+    def __init__(self,
+                n_pages = 10,
+                rows = 100,
+                host = '127.0.0.1',
+                port = 0
+                ):
+
+        #Local parameters
+        self.n_pages = n_pages
+        self.rows = rows
+        self.host = host
+        self.port = port
+        self.last_modified = formatdate(usegmt=True)
+        self.server = None
+        self.requests = 0
+        self.not_modified = 0
+
+    def make_page(self, page):
+        '''
+        Function to generate a ranking page.
+        params:
+            - page: page number.
+        Output: Page html.
+        '''
+        header = ['Twittero', 'Seguido<br/>por', 'Sigue a', 'Tweets', 'Twitea<br/>desde', 'Ultimo<br/>Tweet', 'Categoria']
+        lines = ['<html><body><div id="listado"><table>',
+                 '<tr><td></td>' + ''.join('<td><b>' + name + '</b></td>' for name in header) + '</tr>']
+        for i in range(self.rows):
+            rank = page * self.rows + i
+            lines.append('<tr><td>' + str(rank + 1) + '</td><td><img src="/img/' + str(rank) + '.png"/></td>'
+                         + '<td>@fake_user_' + str(rank) + '<br/>Fake User ' + str(rank) + '</td>'
+                         + '<td>' + format(1000000 - rank * 37, ',') + '</td>'
+                         + '<td>' + format(100 + rank % 900, ',') + '</td>'
+                         + '<td>' + format(5000 + rank * 11, ',') + '</td>'
+                         + '<td>2010-01-' + str(1 + rank % 28).zfill(2) + '</td>'
+                         + '<td>' + ('n/d' if rank % 17 == 0 else '2021-06-' + str(1 + rank % 28).zfill(2)) + '</td>'
+                         + '<td>' + str(rank % 12) + '</td></tr>')
+        lines.append('</table></div></body></html>')
+        return(''.join(lines))
+
+    def start(self):
+        '''
+        Function to serve the pages from a daemon thread.
+        Output: List of urls with the format of the global config.
+        '''
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                fake.requests += 1
+                try:
+                    page = int(self.path.strip('/').split('/')[-1])
+                except ValueError:
+                    page = -1
+                if page < 0 or page >= fake.n_pages:
+                    self.send_error(404)
+                    return
+                body = fake.make_page(page).encode('utf-8')
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag or self.headers.get('If-Modified-Since') == fake.last_modified:
+                    fake.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', fake.last_modified)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        return([['http://' + self.host + ':' + str(self.port) + '/page/' + str(i)] for i in range(self.n_pages)])
+
+    def stop(self):
+        '''
+        Function to stop serving the pages.
+        '''
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,110 @@
+# Spanish vowel accents and other special characters (lower and upper case) removed from locations:
+ACCENTS = (
+    ("á", "a"),
+    ("é", "e"),
+    ("í", "i"),
+    ("ó", "o"),
+    ("ú", "u"),
+    ("ñ", 'n'),
+    ("à", "a"),
+    ("è", "e"),
+    ("ì", "i"),
+    ("ò", "o"),
+    ("ù", "u"),
+    ("ä", 'a'),
+    ("ë", "e"),
+    ("ï", "i"),
+    ("ö", "o"),
+    ("ü", "u"),
+)
+ACCENTS_TABLE = str.maketrans(dict([(a, b) for a, b in ACCENTS] + [(a.upper(), b.upper()) for a, b in ACCENTS]))
+
+
+def normalize_location(location):
+    '''
+    Function to normalize a location: lower captions, without commas, accents
+    and repeated white spaces.
+    params:
+        - location: character string.
+    Output: location normalized.
+    '''
+    return(' '.join(location.lower().replace(',', '').translate(ACCENTS_TABLE).split()))
+
+
+class LocationMatcher:
+    '''
+    Municipalities matcher built once from the municipalities list: a hash set of the
+    normalized names for whole locations, and a token trie to find the names (also
+    multi-word ones) as a sequence of words inside a location.
+    '''
+    def __init__(self,
+                names,
+                ids = None,
+                normalized = False
+                ):
+
+        ids = list(range(len(names))) if ids is None else list(ids)
+
+        #Normalized name -> municipality id, and token trie (None key marks a full name):
+        self.names = {}
+        self.trie = {}
+        for name, mun_id in zip(names, ids):
+            if not isinstance(name, str):
+                continue
+            if not normalized:
+                name = normalize_location(name)
+            if name == '' or name in self.names:
+                continue
+            self.names[name] = mun_id
+            node = self.trie
+            for token in name.split():
+                node = node.setdefault(token, {})
+            node[None] = mun_id
+
+    def __len__(self):
+        return(len(self.names))
+
+    def match(self, location):
+        '''
+        Function to find the municipality of a location: the whole location, or else
+        the longest municipality name found first as a sequence of its words.
+        params:
+            - location: character string.
+        Output: municipality id or None if no municipality is found.
+        '''
+        if not isinstance(location, str):
+            return None
+        location = normalize_location(location)
+        if location in self.names:
+            return self.names[location]
+
+        tokens = location.split()
+        for i in range(len(tokens)):
+            node = self.trie
+            found = None
+            for token in tokens[i:]:
+                node = node.get(token)
+                if node is None:
+                    break
+                if None in node:
+                    found = node[None]
+            if found is not None:
+                return found
+        return None
+
+    def match_many(self, locations):
+        '''
+        Function to find the municipalities of several locations, each distinct
+        location is matched once.
+        params:
+            - locations: iterable of locations (e.g. a dataframe column).
+        Output: list of municipality ids (None if no municipality is found).
+        '''
+        cache = {}
+        output = []
+        for location in locations:
+            key = location if isinstance(location, str) else None
+            if key not in cache:
+                cache[key] = self.match(key)
+            output.append(cache[key])
+        return(output)
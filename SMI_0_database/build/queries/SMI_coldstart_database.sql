@@ -11,14 +11,31 @@ create table smi_schema.smi_users (
     "smi_str_location" varchar,
     "smi_str_lang" varchar,
     "smi_str_lastlookup" varchar,
+    "smi_ts_nextlookup" timestamp NOT NULL DEFAULT now(),
+    "smi_flt_priority" double precision NOT NULL DEFAULT 0,
     primary key ("smi_str_username")
 );
 
+-- Crawl frontier: eligible users by next lookup (the priority moves them ahead in the schedule):
+create index smi_users_nextlookup_idx on smi_schema.smi_users ("smi_ts_nextlookup")
+where "smi_int_followers" < 1000
+and "smi_int_followers" > 50
+and "smi_int_friends" < 1000
+and "smi_int_friends" > 50
+and "smi_bool_protected" = False;
+
 -- Create municipalities table:
 create table smi_schema.smi_munlist (
-    "smi_str_location" varchar NOT NULL
+    "smi_int_munid" serial PRIMARY KEY,
+    "smi_str_location" varchar NOT NULL,
+    "smi_str_location_norm" varchar,
+    "smi_str_province" varchar,
+    "smi_str_region" varchar
 );
 
+-- Lookups by normalized name (lower, without commas, accents and repeated spaces):
+create index smi_munlist_location_norm_idx on smi_schema.smi_munlist ("smi_str_location_norm");
+
 -- Create corpus table:
 create table smi_schema.smi_corpus (
     "smi_str_username" varchar NOT NULL,
@@ -31,12 +48,48 @@ create table smi_schema.smi_corpus (
 create table smi_schema.smi_tweets (
     "smi_str_username" varchar NOT NULL,
     "smi_ts_date" timestamp,
-    "smi_str_tweet" varchar
+    "smi_str_tweet" varchar,
+    "smi_str_tweetkey" varchar NOT NULL,
+    "smi_str_ecoterms" varchar
 );
+
+-- Md5 of user, date and text, duplicates are skipped on insertion:
+create unique index smi_tweets_tweetkey_idx on smi_schema.smi_tweets ("smi_str_tweetkey");
 -- Create dates of tweets retrieved on 
 
 create table smi_schema.smi_date_tweets (
     "smi_str_username" varchar NOT NULL,
     "smi_str_datetweets" varchar,
     primary key("smi_str_username")
-);
\ No newline at end of file
+);
+
+-- Random sampling of the users to enqueue, keyset scan from a pivot of the hashed usernames:
+create index smi_date_tweets_sample_idx on smi_schema.smi_date_tweets (md5("smi_str_username"));
+
+-- Scraped days of each user, bit i set if the day 2012-01-01 + i was scraped:
+create table smi_schema.smi_date_coverage (
+    "smi_str_username" varchar NOT NULL,
+    "smi_bit_days" bit varying NOT NULL,
+    primary key("smi_str_username")
+);
+
+-- Scrap jobs queue, (user, days window) work items claimed by the tweets workers:
+create table smi_schema.smi_scrap_jobs (
+    "smi_int_jobid" bigserial,
+    "smi_str_username" varchar NOT NULL,
+    "smi_dt_ini" date NOT NULL,
+    "smi_dt_end" date NOT NULL,
+    "smi_str_status" varchar NOT NULL default 'pending',
+    "smi_str_worker" varchar,
+    "smi_ts_lease" timestamp,
+    "smi_int_attempts" integer NOT NULL default 0,
+    "smi_ts_updated" timestamp NOT NULL default now(),
+    primary key ("smi_int_jobid")
+);
+
+-- Claim order of the jobs and expired leases:
+create index smi_scrap_jobs_claim_idx on smi_schema.smi_scrap_jobs ("smi_str_status", "smi_int_jobid");
+create index smi_scrap_jobs_lease_idx on smi_schema.smi_scrap_jobs ("smi_ts_lease") where "smi_str_status" = 'running';
+
+-- One active job by user:
+create unique index smi_scrap_jobs_active_idx on smi_schema.smi_scrap_jobs ("smi_str_username") where "smi_str_status" in ('pending', 'running');
@@ -0,0 +1,19 @@
+-- Merge the staged scraped days bitmaps into the coverage table (bitwise OR, padding the shorter bitmap):
+
+INSERT INTO 
+	{schema}.smi_date_coverage 
+		("smi_str_username", 
+        "smi_bit_days")
+SELECT 
+	stg."smi_str_username", 
+	stg."smi_bit_days"
+FROM 
+	{staging} stg
+ON CONFLICT 
+	("smi_str_username") 
+DO
+	UPDATE SET 
+		smi_bit_days = 
+            (smi_date_coverage."smi_bit_days" || REPEAT('0', GREATEST(LENGTH(excluded."smi_bit_days") - LENGTH(smi_date_coverage."smi_bit_days"), 0))::varbit)
+            | (excluded."smi_bit_days" || REPEAT('0', GREATEST(LENGTH(smi_date_coverage."smi_bit_days") - LENGTH(excluded."smi_bit_days"), 0))::varbit)
+;
@@ -0,0 +1,42 @@
+-- One-off migration of the scraped days strings (smi_str_datetweets) into coverage bitmaps:
+
+WITH scraped AS (
+    SELECT DISTINCT
+        sdt."smi_str_username",
+        TO_DATE(TRIM(d.day), 'YYYY-MM-DD') - DATE '2012-01-01' AS idx
+    FROM 
+        {schema}.smi_date_tweets sdt,
+        UNNEST(STRING_TO_ARRAY(sdt."smi_str_datetweets", ',')) AS d(day)
+    WHERE 
+        TRIM(d.day) ~ '^[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]$'
+),
+users AS (
+    SELECT 
+        sc."smi_str_username", 
+        MAX(sc.idx) AS max_idx
+    FROM 
+        scraped sc
+    WHERE 
+        sc.idx >= 0
+    GROUP BY 1
+)
+INSERT INTO 
+    {schema}.smi_date_coverage 
+        ("smi_str_username", 
+        "smi_bit_days")
+SELECT 
+    u."smi_str_username",
+    STRING_AGG(CASE WHEN sc.idx IS NULL THEN '0' ELSE '1' END, '' ORDER BY g.idx)::varbit
+FROM 
+    users u
+CROSS JOIN LATERAL 
+    GENERATE_SERIES(0, u.max_idx) AS g(idx)
+LEFT JOIN 
+    scraped sc
+    ON sc."smi_str_username" = u."smi_str_username" 
+    AND sc.idx = g.idx
+GROUP BY 
+    u."smi_str_username"
+ON CONFLICT 
+    ("smi_str_username") 
+DO NOTHING;
@@ -0,0 +1,10 @@
+-- Script that creates the scraped days coverage table:
+
+drop table if exists smi_schema.smi_date_coverage;
+
+-- Create coverage table, bit i set if the day 2012-01-01 + i was scraped:
+create table smi_schema.smi_date_coverage (
+    "smi_str_username" varchar NOT NULL,
+    "smi_bit_days" bit varying NOT NULL,
+    primary key("smi_str_username")
+);
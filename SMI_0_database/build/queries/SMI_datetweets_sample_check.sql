@@ -0,0 +1,6 @@
+select exists (
+    select from pg_indexes
+    where schemaname = 'smi_schema'
+    and tablename = 'smi_date_tweets'
+    and indexname = 'smi_date_tweets_sample_idx'
+)
\ No newline at end of file
@@ -0,0 +1,4 @@
+-- Script that adds the sampling index to an existing date tweets table:
+
+CREATE INDEX IF NOT EXISTS smi_date_tweets_sample_idx 
+    ON {schema}.smi_date_tweets (md5("smi_str_username"));
@@ -9,3 +9,5 @@ create table smi_schema.smi_date_tweets (
     primary key("smi_str_username")
 );
 
+-- Random sampling of the users to enqueue, keyset scan from a pivot of the hashed usernames:
+create index smi_date_tweets_sample_idx on smi_schema.smi_date_tweets (md5("smi_str_username"));
@@ -0,0 +1,13 @@
+-- Merge the staged users into the date tweets table, the users already on DB are kept:
+
+INSERT INTO 
+    {schema}.smi_date_tweets 
+        ("smi_str_username",
+        "smi_str_datetweets")
+SELECT 
+    stg."smi_str_username",
+    stg."smi_str_datetweets"
+FROM 
+    {staging} stg
+ON CONFLICT ("smi_str_username")
+DO NOTHING;
@@ -0,0 +1,24 @@
+-- Script that creates the scrap jobs queue table:
+
+drop table if exists smi_schema.smi_scrap_jobs;
+
+-- Create scrap jobs table, (user, days window) work items claimed by the tweets workers:
+create table smi_schema.smi_scrap_jobs (
+    "smi_int_jobid" bigserial,
+    "smi_str_username" varchar NOT NULL,
+    "smi_dt_ini" date NOT NULL,
+    "smi_dt_end" date NOT NULL,
+    "smi_str_status" varchar NOT NULL default 'pending',
+    "smi_str_worker" varchar,
+    "smi_ts_lease" timestamp,
+    "smi_int_attempts" integer NOT NULL default 0,
+    "smi_ts_updated" timestamp NOT NULL default now(),
+    primary key ("smi_int_jobid")
+);
+
+-- Claim order of the jobs and expired leases:
+create index smi_scrap_jobs_claim_idx on smi_schema.smi_scrap_jobs ("smi_str_status", "smi_int_jobid");
+create index smi_scrap_jobs_lease_idx on smi_schema.smi_scrap_jobs ("smi_ts_lease") where "smi_str_status" = 'running';
+
+-- One active job by user:
+create unique index smi_scrap_jobs_active_idx on smi_schema.smi_scrap_jobs ("smi_str_username") where "smi_str_status" in ('pending', 'running');
@@ -0,0 +1,17 @@
+-- Merge the staged municipalities into the municipalities table, with the ids drawn on staging:
+
+INSERT INTO {schema}.smi_munlist ("smi_int_munid",
+                                  "smi_str_location",
+                                  "smi_str_location_norm",
+                                  "smi_str_province",
+                                  "smi_str_region")
+SELECT 
+    stg."smi_int_munid",
+    stg."smi_str_location",
+    stg."smi_str_location_norm",
+    stg."smi_str_province",
+    stg."smi_str_region"
+FROM 
+    {staging} stg
+ON CONFLICT ("smi_int_munid")
+DO NOTHING;
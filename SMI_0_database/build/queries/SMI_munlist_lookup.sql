@@ -0,0 +1,9 @@
+-- Municipalities ready to match user locations: id, normalized name and geographic rollups:
+
+SELECT 
+    "smi_int_munid",
+    "smi_str_location_norm",
+    "smi_str_province",
+    "smi_str_region"
+FROM {schema}.smi_munlist
+ORDER BY "smi_int_munid";
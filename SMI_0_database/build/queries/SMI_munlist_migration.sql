@@ -0,0 +1,20 @@
+-- Script that adds the id, normalized name and geographic columns to an existing municipalities table:
+
+ALTER TABLE {schema}.smi_munlist 
+    ADD COLUMN IF NOT EXISTS "smi_int_munid" serial,
+    ADD COLUMN IF NOT EXISTS "smi_str_location_norm" varchar,
+    ADD COLUMN IF NOT EXISTS "smi_str_province" varchar,
+    ADD COLUMN IF NOT EXISTS "smi_str_region" varchar;
+
+-- Normalized name of the municipalities already on DB (same as normalize_location):
+UPDATE {schema}.smi_munlist
+SET "smi_str_location_norm" = TRIM(REGEXP_REPLACE(
+        TRANSLATE(REPLACE(LOWER("smi_str_location"), ',', ''), 'áéíóúñàèìòùäëïöü', 'aeiounaeiouaeiou'),
+        '\s+', ' ', 'g'))
+WHERE "smi_str_location_norm" IS NULL;
+
+ALTER TABLE {schema}.smi_munlist 
+    ADD PRIMARY KEY ("smi_int_munid");
+
+CREATE INDEX IF NOT EXISTS smi_munlist_location_norm_idx 
+    ON {schema}.smi_munlist ("smi_str_location_norm");
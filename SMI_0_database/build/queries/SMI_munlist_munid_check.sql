@@ -0,0 +1,6 @@
+select exists (
+    select from information_schema.columns
+    where table_schema = 'smi_schema'
+    and table_name = 'smi_munlist'
+    and column_name = 'smi_int_munid'
+)
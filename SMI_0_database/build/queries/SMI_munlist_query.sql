@@ -1,2 +0,0 @@
-select *
-from smi_schema.smi_munlist;
\ No newline at end of file
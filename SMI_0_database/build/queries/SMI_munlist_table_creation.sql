@@ -4,6 +4,12 @@ drop table if exists smi_schema.smi_munlist;
 
 -- Create municipalities table:
 create table smi_schema.smi_munlist (
-    "smi_str_location" varchar NOT NULL
+    "smi_int_munid" serial PRIMARY KEY,
+    "smi_str_location" varchar NOT NULL,
+    "smi_str_location_norm" varchar,
+    "smi_str_province" varchar,
+    "smi_str_region" varchar
 );
 
+-- Lookups by normalized name (lower, without commas, accents and repeated spaces):
+create index smi_munlist_location_norm_idx on smi_schema.smi_munlist ("smi_str_location_norm");
@@ -0,0 +1,6 @@
+select exists (
+    select from information_schema.columns
+    where table_schema = 'smi_schema'
+    and table_name = 'smi_tweets'
+    and column_name = 'smi_str_ecoterms'
+)
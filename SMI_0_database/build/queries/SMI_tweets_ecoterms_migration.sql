@@ -0,0 +1,5 @@
+-- Script that adds the filtering words found on each tweet to an existing tweets table
+-- (empty for the tweets already on DB):
+
+ALTER TABLE {schema}.smi_tweets 
+    ADD COLUMN IF NOT EXISTS "smi_str_ecoterms" varchar;
@@ -0,0 +1,27 @@
+-- Script that adds the unique tweet key to an existing tweets table:
+
+ALTER TABLE {schema}.smi_tweets 
+    ADD COLUMN IF NOT EXISTS "smi_str_tweetkey" varchar;
+
+-- Key of the tweets already on DB (md5 of user, date and text):
+UPDATE {schema}.smi_tweets
+SET "smi_str_tweetkey" = md5(
+        COALESCE("smi_str_username", '') || '|' || 
+        COALESCE(TO_CHAR("smi_ts_date", 'YYYY-MM-DD HH24:MI:SS'), '') || '|' || 
+        COALESCE("smi_str_tweet", '')
+    )
+WHERE "smi_str_tweetkey" IS NULL;
+
+-- Last full pass removing duplicated tweets:
+DELETE FROM {schema}.smi_tweets suta
+USING (SELECT ctid, 
+              row_number() OVER (PARTITION BY "smi_str_tweetkey" ORDER BY ctid) AS rn
+       FROM {schema}.smi_tweets) sutb
+WHERE suta.ctid = sutb.ctid
+AND sutb.rn > 1;
+
+ALTER TABLE {schema}.smi_tweets 
+    ALTER COLUMN "smi_str_tweetkey" SET NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS smi_tweets_tweetkey_idx 
+    ON {schema}.smi_tweets ("smi_str_tweetkey");
@@ -6,6 +6,11 @@ drop table if exists smi_schema.smi_tweets;
 create table smi_schema.smi_tweets (
     "smi_str_username" varchar NOT NULL,
     "smi_ts_date" timestamp,
-    "smi_str_tweet" varchar
+    "smi_str_tweet" varchar,
+    "smi_str_tweetkey" varchar NOT NULL,
+    "smi_str_ecoterms" varchar
 );
 
+-- Md5 of user, date and text, duplicates are skipped on insertion:
+create unique index smi_tweets_tweetkey_idx on smi_schema.smi_tweets ("smi_str_tweetkey");
+
@@ -0,0 +1,32 @@
+-- Merge the staged users into the users table, the users already on DB are kept:
+
+INSERT INTO 
+    {schema}.smi_users 
+        ("smi_str_userid", 
+        "smi_str_username",
+        "smi_int_followers", 
+        "smi_int_friends", 
+        "smi_bool_protected", 
+        "smi_str_location", 
+        "smi_str_lang", 
+        "smi_str_lastlookup",
+        "smi_ts_nextlookup")
+SELECT 
+    stg."smi_str_userid", 
+    stg."smi_str_username",
+    stg."smi_int_followers", 
+    stg."smi_int_friends", 
+    stg."smi_bool_protected", 
+    stg."smi_str_location", 
+    stg."smi_str_lang", 
+    stg."smi_str_lastlookup",
+    CASE 
+        WHEN stg."smi_str_lastlookup" ~ '^[0-9]+-[0-9]+-[0-9]+$' 
+        THEN TO_TIMESTAMP(stg."smi_str_lastlookup", 'YYYY-MM-DD') 
+        ELSE now() 
+    END
+FROM 
+    {staging} stg
+ON CONFLICT 
+    ("smi_str_username")
+DO NOTHING;
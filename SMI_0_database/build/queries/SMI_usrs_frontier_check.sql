@@ -0,0 +1,6 @@
+select exists (
+    select from pg_indexes
+    where schemaname = 'smi_schema'
+    and tablename = 'smi_users'
+    and indexname = 'smi_users_nextlookup_idx'
+)
\ No newline at end of file
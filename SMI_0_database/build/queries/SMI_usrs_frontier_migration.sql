@@ -0,0 +1,29 @@
+-- Script that adds the crawl frontier schedule to an existing users table: a typed
+-- next lookup (from the lookup date string) and a priority, with the frontier index:
+
+ALTER TABLE {schema}.smi_users 
+    ADD COLUMN IF NOT EXISTS "smi_ts_nextlookup" timestamp,
+    ADD COLUMN IF NOT EXISTS "smi_flt_priority" double precision NOT NULL DEFAULT 0;
+
+-- The lookup date string already holds the next lookup date (a month after the last one):
+UPDATE {schema}.smi_users
+SET "smi_ts_nextlookup" = CASE 
+        WHEN "smi_str_lastlookup" ~ '^[0-9]+-[0-9]+-[0-9]+$' 
+        THEN TO_TIMESTAMP("smi_str_lastlookup", 'YYYY-MM-DD') 
+        ELSE now() 
+    END
+WHERE "smi_ts_nextlookup" IS NULL;
+
+ALTER TABLE {schema}.smi_users 
+    ALTER COLUMN "smi_ts_nextlookup" SET DEFAULT now(),
+    ALTER COLUMN "smi_ts_nextlookup" SET NOT NULL;
+
+DROP INDEX IF EXISTS {schema}.smi_users_frontier_idx;
+
+CREATE INDEX IF NOT EXISTS smi_users_nextlookup_idx 
+    ON {schema}.smi_users ("smi_ts_nextlookup")
+    WHERE "smi_int_followers" < 1000
+    AND "smi_int_followers" > 50
+    AND "smi_int_friends" < 1000
+    AND "smi_int_friends" > 50
+    AND "smi_bool_protected" = False;
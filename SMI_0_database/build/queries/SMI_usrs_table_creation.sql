@@ -12,5 +12,15 @@ create table smi_schema.smi_users (
     "smi_str_location" varchar,
     "smi_str_lang" varchar,
     "smi_str_lastlookup" varchar,
+    "smi_ts_nextlookup" timestamp NOT NULL DEFAULT now(),
+    "smi_flt_priority" double precision NOT NULL DEFAULT 0,
     primary key ("smi_str_username")
 );
+
+-- Crawl frontier: eligible users by next lookup (the priority moves them ahead in the schedule):
+create index smi_users_nextlookup_idx on smi_schema.smi_users ("smi_ts_nextlookup")
+where "smi_int_followers" < 1000
+and "smi_int_followers" > 50
+and "smi_int_friends" < 1000
+and "smi_int_friends" > 50
+and "smi_bool_protected" = False;
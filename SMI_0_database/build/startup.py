@@ -0,0 +1,39 @@
+import time
+
+
+class StartupReport:
+    '''
+    Startup time report of a service entry point: the time spent on each import
+    and initialization step, marked in order since the report was created.
+    '''
+    def __init__(self):
+
+        #Local parameters
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.steps = []
+
+    def mark(self, step):
+        '''
+        Function to close a startup step.
+        params:
+            - step: name of the step finished since the previous mark.
+        output: seconds spent on the step.
+        '''
+        now = time.perf_counter()
+        seconds = now - self.last
+        self.steps.append((step, seconds))
+        self.last = now
+        return(seconds)
+
+    def report(self, logger):
+        '''
+        Function to log the time spent on each startup step and the total.
+        params:
+            - logger: logger of the entry point.
+        output: list of (step, seconds) tuples.
+        '''
+        for step, seconds in self.steps:
+            logger.info('Startup: ' + step + ': ' + '{:.3f}'.format(seconds) + ' seconds.')
+        logger.info('Startup: Total: ' + '{:.3f}'.format(self.last - self.start) + ' seconds.')
+        return(self.steps)
@@ -8,10 +8,21 @@ from psycopg2 import sql
 from io import StringIO
 import os
 import json
+import time
+import hashlib
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from bs4 import BeautifulSoup
-import spacy
-nlp = spacy.load('es_core_news_sm')
+from lxml import html as lxml_html
+
+from cleaning import TweetCleaner, Lemmatizer, ACCENTS_TABLE, load_artifact, save_artifact
+from locations import LocationMatcher, normalize_location
+from users_log import UsersLog
+
+# First day of the scraped days coverage bitmaps:
+COVERAGE_START = '2012-01-01'
 
 class DatabaseCreation:
     '''
@@ -28,7 +39,15 @@ class DatabaseCreation:
                 ini_users_dict,
                 users_table,
                 corpus_table,
-                munlist_table
+                munlist_table,
+                batch_size = 10000,
+                ecofilter_mode = 'substring',
+                text_workers = 0,
+                lemmatizer = None,
+                http_cache_path = None,
+                http_workers = 8,
+                http_timeout = 30,
+                text_parallel_min = 20000
                 ):
 
         #Local parameters
@@ -46,6 +65,17 @@ class DatabaseCreation:
         self.users_table = users_table
         self.corpus_table = corpus_table
         self.munlist_table = munlist_table
+        self.batch_size = batch_size
+        self.ecofilter_mode = ecofilter_mode
+        self.text_workers = text_workers
+        self.lemmatizer = lemmatizer
+        self.cleaner = None
+        self.text_parallel_min = text_parallel_min
+        self.clean_pool = None
+        self.http_cache_path = http_cache_path
+        self.http_workers = http_workers
+        self.http_timeout = http_timeout
+        self.session = None
 
     ## DATABASE QUERY FUNCTIONS:
 
@@ -94,19 +124,21 @@ class DatabaseCreation:
 
         cur.close()
 
-    def query_SQL(self, path):
+    def fetchall_rows(self, path):
         """
-        Function to make a query to database:
+        Function to fetch all observations, with all their columns, from a query to database:
         params:
             - path: relative path to the file.
         """
         # Read the SQL query from .sql file:
-        with open(path, 'r') as f:
+        with open(path, 'r') as f: 
             query = f.read().format(schema=self.schema)
         cur = self.conn.cursor()
 
         try:
             cur.execute(query)
+            db_fetch = cur.fetchall()
+            return(db_fetch)
 
         except (Exception, psycopg2.DatabaseError) as error:
             self.conn.rollback()
@@ -114,47 +146,25 @@ class DatabaseCreation:
 
         cur.close()
 
-    def eachrow_to_postgres(self, path, df):
-        '''
-        Function to insert users into DB by row.
+    def query_SQL(self, path):
+        """
+        Function to make a query to database:
         params:
-            - path: query path.
-            - df: dataframe to persist into db.
-        output: no output provided.
-        '''
+            - path: relative path to the file.
+        """
+        # Read the SQL query from .sql file:
+        with open(path, 'r') as f:
+            query = f.read().format(schema=self.schema)
+        cur = self.conn.cursor()
+
         try:
-            cur = self.conn.cursor()
-            with open(path, 'r') as f:
-                query = f.read().format(schema = self.schema)
-            for row in df.values:
-                cur.execute(sql.SQL(query).format(schema=sql.Identifier(self.schema)), tuple(row))
+            cur.execute(query)
 
         except (Exception, psycopg2.DatabaseError) as error:
-
             self.conn.rollback()
-            cur.close()
             self.api_logger.exception(error)
 
-    def datetweet_to_postgres(self, path, df):
-        '''
-        Function to insert tweets date by user into DB and by row.
-        params:
-            - path: query path.
-            - df: dataframe to persist into db.
-        output: no output provided.
-        '''
-        try:
-            ## Insert into DB by row:
-            with self.conn:
-                with self.conn.cursor() as cur:
-                    with open(path, 'r') as f:
-                        query = f.read().format(schema = self.schema)
-                    for row in df.values:
-                        cur.execute(sql.SQL(query).format(schema=sql.Identifier(self.schema)), tuple(row))
-            
-        except (Exception, psycopg2.DatabaseError) as error:
-            self.conn.rollback()
-            cur.close()
+        cur.close()
 
     def df_to_postgres(self, df, table):
         """
@@ -182,6 +192,64 @@ class DatabaseCreation:
 
         cur.close()
 
+    def bulk_upsert_to_postgres(self, path, df, table, batch_size = None):
+        '''
+        Function to upsert a dataframe into DB by batches. Each batch is copied into
+        a temporary staging table and merged into the target table with one query.
+        params:
+            - path: merge query path (INSERT ... SELECT ... ON CONFLICT from {staging}).
+            - df: dataframe to persist into db, named as the target table columns.
+            - table: target database table.
+            - batch_size: rows per batch, by default the instance batch size.
+        output: number of rows inserted or updated on the target table, None if a batch failed
+                (the batches before it are already committed).
+        '''
+        batch_size = batch_size or self.batch_size
+        staging = 'smi_staging_' + table
+        n_rows = 0
+        cur = self.conn.cursor()
+
+        try:
+            # Read the staging and merge queries:
+            with open(self.queries_path + 'SMI_staging_table_creation.sql', 'r') as f:
+                staging_query = sql.SQL(f.read()).format(schema=sql.Identifier(self.schema),
+                                                         table=sql.Identifier(table),
+                                                         staging=sql.Identifier(staging))
+            with open(path, 'r') as f:
+                merge_query = sql.SQL(f.read()).format(schema=sql.Identifier(self.schema),
+                                                       staging=sql.Identifier(staging))
+            copy_query = sql.SQL("COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')").format(
+                                                       staging=sql.Identifier(staging),
+                                                       columns=sql.SQL(', ').join(map(sql.Identifier, df.columns)))
+            copy_query = copy_query.as_string(cur)
+
+            start = time.perf_counter()
+            for i in range(0, df.shape[0], batch_size):
+                #Buffering the batch into memory (empty strings kept, NaN as NULL):
+                buffer = StringIO()
+                df.iloc[i:i + batch_size].to_csv(buffer, header=False, index=False, na_rep='\\N')
+                buffer.seek(0)
+
+                #Copy the batch into the staging table and merge it:
+                cur.execute(staging_query)
+                cur.copy_expert(copy_query, buffer)
+                cur.execute(merge_query)
+                n_rows += cur.rowcount
+                self.conn.commit()
+
+            elapsed = time.perf_counter() - start
+            self.api_logger.info('Database job: Bulk upsert into ' + table + ': ' + str(df.shape[0]) + 
+                                 ' rows staged, ' + str(n_rows) + ' rows merged in ' + str(round(elapsed, 2)) + 
+                                 ' seconds (' + str(int(df.shape[0] / elapsed if elapsed > 0 else df.shape[0])) + ' rows/s).')
+
+        except (Exception, psycopg2.DatabaseError) as error:
+            self.conn.rollback()
+            self.api_logger.exception(error)
+            n_rows = None
+
+        cur.close()
+        return(n_rows)
+
     ## DATABASE INITIALIZATION FUNCTION:
     
     def db_init(self):
@@ -202,9 +270,16 @@ class DatabaseCreation:
                 self.api_logger.info('Database job: Check if users table exist on DB.')
                 db_usr_check = self.fetchone_SQL(self.queries_path + 'SMI_usrs_table_check.sql')
 
-                #If exists, do nothing.
+                #If exists, check the crawl frontier schedule.
                 if db_usr_check:
                     self.api_logger.info('Database job: Users table exist on DB.')
+                    db_usr_frontier_check = self.fetchone_SQL(self.queries_path + 'SMI_usrs_frontier_check.sql')
+
+                    # If the schedule does not exist, add the next lookup, the priority and their index.
+                    if not db_usr_frontier_check:
+                        self.api_logger.info('Database job: Adding crawl frontier schedule to users table on DB.')
+                        self.query_SQL(self.queries_path + 'SMI_usrs_frontier_migration.sql')
+                        self.api_logger.info('Database job: Crawl frontier schedule added to users table on DB.')
 
                 #If it does not exist, create users table.
                 else:
@@ -232,9 +307,16 @@ class DatabaseCreation:
                 self.api_logger.info('Database job: Check if municipalities table exist on DB.')
                 db_munlist_check = self.fetchone_SQL(self.queries_path + 'SMI_munlist_table_check.sql')
 
-                # If exists, do nothing.
+                # If exists, check the municipalities id.
                 if db_munlist_check:
                     self.api_logger.info('Database job: Municipalities table exist on DB.')
+                    db_munlist_id_check = self.fetchone_SQL(self.queries_path + 'SMI_munlist_munid_check.sql')
+
+                    # If the id does not exist, add it with the normalized name and geographic columns.
+                    if not db_munlist_id_check:
+                        self.api_logger.info('Database job: Adding id and normalized names to municipalities table on DB.')
+                        self.query_SQL(self.queries_path + 'SMI_munlist_migration.sql')
+                        self.api_logger.info('Database job: Id and normalized names added to municipalities table on DB.')
 
                 # If it does not exist, create munlist table.
                 else:
@@ -247,9 +329,23 @@ class DatabaseCreation:
                 self.api_logger.info('Database job: Check if tweets table exist on DB.')
                 db_tweets_check = self.fetchone_SQL(self.queries_path + 'SMI_tweets_table_check.sql')
 
-                # If exists, do nothing.
+                # If exists, check the unique tweet key.
                 if db_tweets_check:
                     self.api_logger.info('Database job: Tweets table exist on DB.')
+                    db_tweets_key_check = self.fetchone_SQL(self.queries_path + 'SMI_tweets_key_check.sql')
+
+                    # If the key does not exist, add it and drop duplicated tweets.
+                    if not db_tweets_key_check:
+                        self.api_logger.info('Database job: Adding unique key to tweets table on DB.')
+                        self.query_SQL(self.queries_path + 'SMI_tweets_key_migration.sql')
+                        self.api_logger.info('Database job: Unique key added to tweets table on DB.')
+
+                    # If the filtering words column does not exist, add it.
+                    db_tweets_terms_check = self.fetchone_SQL(self.queries_path + 'SMI_tweets_ecoterms_check.sql')
+                    if not db_tweets_terms_check:
+                        self.api_logger.info('Database job: Adding filtering words column to tweets table on DB.')
+                        self.query_SQL(self.queries_path + 'SMI_tweets_ecoterms_migration.sql')
+                        self.api_logger.info('Database job: Filtering words column added to tweets table on DB.')
 
                 # If it does not exist, create tweets table.
                 else:
@@ -262,9 +358,16 @@ class DatabaseCreation:
                 self.api_logger.info('Database job: Check if date tweets table exist on DB.')
                 db_dt_check = self.fetchone_SQL(self.queries_path + 'SMI_datetweets_table_check.sql')
 
-                # If exists, do nothing.
+                # If exists, check the sampling index.
                 if db_dt_check:
                     self.api_logger.info('Database job: Date tweets table exist on DB.')
+                    db_dt_sample_check = self.fetchone_SQL(self.queries_path + 'SMI_datetweets_sample_check.sql')
+
+                    # If the index does not exist, add it.
+                    if not db_dt_sample_check:
+                        self.api_logger.info('Database job: Adding sampling index to date tweets table on DB.')
+                        self.query_SQL(self.queries_path + 'SMI_datetweets_sample_migration.sql')
+                        self.api_logger.info('Database job: Sampling index added to date tweets table on DB.')
 
                 # If it does not exist, create tweets table.
                 else:
@@ -273,6 +376,37 @@ class DatabaseCreation:
                     self.query_SQL(self.queries_path + 'SMI_datetweets_table_creation.sql')
                     self.api_logger.info('Database job: Date tweets table created on DB.')
 
+                ## Check date coverage table.
+                self.api_logger.info('Database job: Check if date coverage table exist on DB.')
+                db_cov_check = self.fetchone_SQL(self.queries_path + 'SMI_coverage_table_check.sql')
+
+                # If exists, do nothing.
+                if db_cov_check:
+                    self.api_logger.info('Database job: Date coverage table exist on DB.')
+
+                # If it does not exist, create it and migrate the scraped days from the date tweets table.
+                else:
+                    self.api_logger.info('Database job: Date coverage table does not exist on DB.')
+                    self.api_logger.info('Database job: Creating date coverage table on DB.')
+                    self.query_SQL(self.queries_path + 'SMI_coverage_table_creation.sql')
+                    self.query_SQL(self.queries_path + 'SMI_coverage_migration.sql')
+                    self.api_logger.info('Database job: Date coverage table created on DB.')
+
+                ## Check scrap jobs table.
+                self.api_logger.info('Database job: Check if scrap jobs table exist on DB.')
+                db_jobs_check = self.fetchone_SQL(self.queries_path + 'SMI_jobs_table_check.sql')
+
+                # If exists, do nothing.
+                if db_jobs_check:
+                    self.api_logger.info('Database job: Scrap jobs table exist on DB.')
+
+                # If it does not exist, create scrap jobs table.
+                else:
+                    self.api_logger.info('Database job: Scrap jobs table does not exist on DB.')
+                    self.api_logger.info('Database job: Creating scrap jobs table on DB.')
+                    self.query_SQL(self.queries_path + 'SMI_jobs_table_creation.sql')
+                    self.api_logger.info('Database job: Scrap jobs table created on DB.')
+
             # If schema does not exists, create schema and tables.
             else:
 
@@ -286,19 +420,123 @@ class DatabaseCreation:
 
     ## INITIAL USERS FUNCTIONS:
 
-    def get_info(self, url, header):
+    def http_session(self):
+        '''
+        Function to get the HTTP session of the instance, with a connection pool
+        sized for the concurrent page fetches.
+        Output: requests session.
+        '''
+        if self.session is None:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.http_workers, pool_maxsize=self.http_workers)
+            self.session = requests.Session()
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+        return(self.session)
+
+    def fetch_page(self, url, header):
+        '''
+        Function to get the text of a page through the on-disk HTTP cache: a cached
+        page is revalidated with its ETag / Last-Modified and reused on 304.
+        Params:
+            - url: page url.
+            - header: specifies robots.txt user agent.
+        Output: Page text.
+        '''
+        headers = dict(header or {})
+        meta = {}
+        body_path = meta_path = None
+
+        #Conditional request from the cached validators:
+        if self.http_cache_path is not None:
+            key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+            body_path = os.path.join(self.http_cache_path, key + '.html')
+            meta_path = os.path.join(self.http_cache_path, key + '.json')
+            if os.path.isfile(body_path) and os.path.isfile(meta_path):
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+
+        page = self.http_session().get(url, headers = headers, timeout = self.http_timeout)
+
+        if page.status_code == 304 and meta:
+            with open(body_path, 'r', encoding='utf-8') as f:
+                return(f.read())
+        page.raise_for_status()
+        text = page.text
+
+        #Store the page when it can be revalidated later:
+        meta = {'url': url, 'etag': page.headers.get('ETag'), 'last_modified': page.headers.get('Last-Modified')}
+        if body_path is not None and (meta['etag'] or meta['last_modified']):
+            if not os.path.isdir(self.http_cache_path):
+                os.makedirs(self.http_cache_path, exist_ok=True)
+            for path, content in [(body_path, text), (meta_path, json.dumps(meta))]:
+                tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+
+        return(text)
+
+    def parse_users_table(self, text):
+        '''
+        Function to parse the users table of a ranking page with lxml.
+        Params:
+            - text: page text.
+        Output: Dataframe with cleaned data, None if the table is not found.
+        '''
+        root = lxml_html.fromstring(text)
+        results = root.get_element_by_id('listado', None)
+        if results is None:
+            return(None)
+        tables = [results] if results.tag == 'table' else results.xpath('.//table')
+        if not tables:
+            return(None)
+
+        colnames = None
+        records = []
+        for row in tables[0].xpath('./tr|./thead/tr|./tbody/tr'):
+            #Get column names from the bold cells of the first row:
+            if colnames is None:
+                names = [' '.join(' '.join(b.itertext()).split()) for b in row.xpath('./td//b|./th//b')]
+                if names:
+                    colnames = names
+                continue
+
+            #Values are the last cells of each row:
+            cells = row.xpath('./td')
+            if len(cells) < len(colnames):
+                continue
+            record = []
+            for name, cell in zip(colnames, cells[-len(colnames):]):
+                if name == 'Twittero':
+                    handles = [t.strip() for t in cell.itertext() if t.strip().startswith('@')]
+                    record.append(handles[0][1:].split()[0] if handles and len(handles[0]) > 1 else '')
+                else:
+                    record.append(''.join(cell.itertext()).strip().replace(',', ''))
+            records.append(record)
+
+        if colnames is None:
+            return(None)
+        return(pd.DataFrame(records, columns = colnames))
+
+    def get_info(self, url, header, text = None):
         '''
         Function to get the initial twitter users file.
         Params: 
             - url: list of url pages with the most followed spanish twitter accounts.
             - header: specifies robots.txt user agent.
+            - text: page text, if it's already fetched.
         Output: Uncleaned dataframe with parsed tables.
         '''
         try:
 
             #Get text from url:
-            page = requests.get(url, headers = header)
-            soup = BeautifulSoup(page.text, "lxml")
+            if text is None:
+                text = self.fetch_page(url, header)
+            soup = BeautifulSoup(text, "lxml")
             results = soup.find(id="listado")
             
             #Get table from text:
@@ -371,12 +609,19 @@ class DatabaseCreation:
         '''
         try:
 
-            #Scrap info from wp:
-            info = self.get_info(url, header)
-
             #Columns to clean:
             cols = ['Twittero', 'Seguido por', 'Sigue a', 'Tweets', 'Twitea desde', 'Ultimo Tweet', 'Categoria']
 
+            #Scrap info from wp, parsed with lxml:
+            text = self.fetch_page(url, header)
+            info = self.parse_users_table(text)
+            if info is not None and set(cols) <= set(info.columns) and info.shape[0] > 0 and (info['Twittero'] != '').all():
+                return(info)
+
+            #Fallback to the soup parser if the page layout is not the expected one:
+            self.api_logger.info('Data job: Unexpected users table layout in ' + url + ', parsing with BeautifulSoup.')
+            info = self.get_info(url, header, text)
+
             #Clean columns:
             for col in cols:
                 if col == 'Twittero':
@@ -398,16 +643,15 @@ class DatabaseCreation:
             - header: specifies robots.txt user agent.
         Output: Users list and users table
         '''
-        #Get all users from tables of different sections:
+        #Get all users from tables of different sections, fetched concurrently:
         try:
-            users = []
-            df_out = pd.DataFrame()
+            with ThreadPoolExecutor(max_workers=max(1, self.http_workers)) as executor:
+                dfs = list(executor.map(lambda url: self.get_initial_users_table(url[0], self.header), self.url))
 
-            for i in range(len(self.url)):
-                #Create users dataframe and users list:
-                df = self.get_initial_users_table(self.url[i][0], self.header)
-                df_out = pd.concat([df_out, df], axis=0).reset_index(drop=True)
-                users.extend(df['Twittero'].to_list())
+            #Create users dataframe and users list:
+            dfs = [df for df in dfs if df is not None]
+            df_out = pd.concat(dfs, axis=0).reset_index(drop=True)
+            users = df_out['Twittero'].to_list()
 
             #Drop duplicates:
             if len(users) != len(set(users)):
@@ -437,41 +681,14 @@ class DatabaseCreation:
             # Scrap ini users, create backup and fill database table:
             df = self.get_tw_users_list()
             
-            # Treat users:
+            # Treat users, their profiles are resolved by batches:
             self.api_logger.info('Data job: Treat initial users.')
             df_ini_list = df['screenName'].tolist()
-            df_users = pd.DataFrame(columns=['smi_str_userid', 
-                                 'smi_str_username', 
-                                 'smi_int_followers', 
-                                 'smi_int_friends', 
-                                 'smi_bool_protected',
-                                 'smi_str_location',
-                                 'smi_str_lang'])
+            df_users = self.lookup_profiles(df_ini_list)
 
         except Exception as error:
             self.api_logger.exception(error)
 
-        for user in df_ini_list:
-            try:
-                user_obj = self.api.get_user(screen_name = user)
-                df_users = pd.concat([df_users, 
-                                pd.DataFrame([[user_obj.id, 
-                                                user_obj.screen_name, 
-                                                user_obj.followers_count,
-                                                user_obj.friends_count,
-                                                user_obj.protected,
-                                                user_obj.location,
-                                                user_obj.lang]], columns=['smi_str_userid', 
-                                                                        'smi_str_username', 
-                                                                        'smi_int_followers', 
-                                                                        'smi_int_friends', 
-                                                                        'smi_bool_protected',
-                                                                        'smi_str_location',
-                                                                        'smi_str_lang'])], axis=0)
-
-            except Exception as error:
-                pass
-
         try:
             df = df_users.reset_index(drop=True)
             df['smi_str_lastlookup'] = ''
@@ -485,22 +702,56 @@ class DatabaseCreation:
             # Save initial users to backup:
             self.api_logger.info('Data job: Save initial users to json backup.')
             df.to_json(temp_data_path + 'get_users/db_users_' + db_today + '.json', orient='records', date_format='iso')
+            UsersLog(temp_data_path + 'get_users/users_log/').append(df.to_dict('records'))
             
             # Store initial users on DB:
             self.api_logger.info('Database job: Insert initial users on DB.')
-            self.eachrow_to_postgres(self.queries_path + 'SMI_usrs_insertion.sql', df)
+            self.bulk_upsert_to_postgres(self.queries_path + 'SMI_usrs_bulk_insertion.sql', df, 'smi_users')
             self.api_logger.info('Database job: Initial users inserted on DB.')
 
             # Users to date_tweets:
             self.api_logger.info('Database job: Insert users into date tweets DB table.')
             df['smi_str_datetweets'] = ''
             df = df[['smi_str_username', 'smi_str_datetweets']]
-            self.eachrow_to_postgres(self.queries_path + 'SMI_datetweets_users_insertion.sql', df)
+            self.bulk_upsert_to_postgres(self.queries_path + 'SMI_datetweets_users_bulk_insertion.sql', df, 'smi_date_tweets')
             self.api_logger.info('Database job: Users inserted into date tweets DB table.')
             
         except Exception as error:
             self.api_logger.exception(error)
 
+    def lookup_profiles(self, screen_names, batch = 100):
+        '''
+        Function to get the profiles of several users, resolving up to batch
+        screen names on each API call (users not found are skipped).
+        params:
+            - screen_names: list of twitter users screen names.
+            - batch: screen names per API call (100 at most).
+        Output: dataframe with the users table columns.
+        '''
+        screen_names = list(dict.fromkeys([name for name in screen_names if isinstance(name, str)]))
+        records = []
+        for i in range(0, len(screen_names), batch):
+            try:
+                for user_obj in self.api.lookup_users(screen_name = screen_names[i:i + batch]):
+                    records.append([user_obj.id, 
+                                    user_obj.screen_name, 
+                                    user_obj.followers_count,
+                                    user_obj.friends_count,
+                                    user_obj.protected,
+                                    user_obj.location,
+                                    user_obj.lang])
+            except Exception as error:
+                self.api_logger.exception(error)
+
+        self.api_logger.info('Twitter API job: Profiles retrieved: ' + str(len(records)) + ' of ' + str(len(screen_names)) + ' users.')
+        return(pd.DataFrame(records, columns=['smi_str_userid', 
+                                              'smi_str_username', 
+                                              'smi_int_followers', 
+                                              'smi_int_friends', 
+                                              'smi_bool_protected',
+                                              'smi_str_location',
+                                              'smi_str_lang']))
+
     ## USERS FUNCTIONS:
 
     def accent_rem(self, name):
@@ -511,29 +762,8 @@ class DatabaseCreation:
         Output: string without accents.
         '''
         try:
-            #Define replacements (possible accents or other special char)
-            replacements = (
-                ("á", "a"),
-                ("é", "e"),
-                ("í", "i"),
-                ("ó", "o"),
-                ("ú", "u"),
-                ("ñ", 'n'),
-                ("à", "a"),
-                ("è", "e"),
-                ("ì", "i"),
-                ("ò", "o"),
-                ("ù", "u"),
-                ("ä", 'a'),
-                ("ë", "e"),
-                ("ï", "i"),
-                ("ö", "o"),
-                ("ü", "u"),
-            )
-            #Replace with tuple:
-            for a, b in replacements:
-                name = name.replace(a, b).replace(a.upper(), b.upper())
-            return(name)
+            #Replace accents (or other special char) with the translation table:
+            return(name.translate(ACCENTS_TABLE))
         except Exception as error:
             self.api_logger.exception(error)
 
@@ -542,23 +772,78 @@ class DatabaseCreation:
         Function to filter the location field given a municipalities list, to ensure spanish users:
         params:
             - df: input dataframe with users information:
-            - munlist: list of municipalities:
+            - munlist: municipalities matcher (LocationMatcher):
         Output: filtered users table.
         '''
         try:
             # Adapt location string
-            df[loc_column] = df[loc_column].apply(lambda r: ' '.join([self.accent_rem(word.lower().replace(',', '')) for word in r.split()]))
+            df[loc_column] = df[loc_column].apply(normalize_location)
 
-            # Filter location:
-            df = df[df[loc_column].isin(munlist)]
+            # Filter location (whole location or a sequence of its words), each distinct location is matched once:
+            munids = munlist.match_many(df[loc_column])
+            df = df[[munid is not None for munid in munids]]
             return(df)
 
         except Exception as error:
             self.api_logger.exception(error)
 
+    def iter_json_records(self, path, chunk_size = None, read_size = 1 << 20, max_record_size = None):
+        '''
+        Function to read the records of a JSON array or JSON lines file incrementally.
+        params:
+            - path: path to the file.
+            - chunk_size: number of records on each chunk, by default the instance batch size.
+            - read_size: number of characters read from the file on each step.
+            - max_record_size: maximum number of characters of a record, by default 8 times read_size
+              (a record which can't be decoded within it is malformed).
+        Output: generator of lists of records (dictionaries), chunk_size records at most.
+        '''
+        chunk_size = chunk_size or self.batch_size
+        max_record_size = max_record_size or 8 * read_size
+        decoder = json.JSONDecoder()
+        separators = re.compile(r'[\s,]*')
+        chunk = []
+
+        with open(path, 'r') as f:
+            buffer, pos, eof, started = '', 0, False, False
+            while True:
+                #Skip whitespaces and commas between records, reading more text if needed:
+                pos = separators.match(buffer, pos).end()
+                if pos == len(buffer) and not eof:
+                    buffer, pos = f.read(read_size), 0
+                    eof = not buffer
+                    continue
+                if pos == len(buffer) or (started and buffer[pos] == ']'):
+                    break
+                #Skip the opening bracket of a JSON array:
+                if not started:
+                    started = True
+                    if buffer[pos] == '[':
+                        pos += 1
+                        continue
+                #Decode next record, if it is not complete on the buffer read more text
+                #(up to the maximum record size, a malformed record raises the decoding error):
+                try:
+                    record, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    more = '' if eof or len(buffer) - pos > max_record_size else f.read(read_size)
+                    if not more:
+                        raise
+                    buffer, pos = buffer[pos:] + more, 0
+                    continue
+
+                chunk.append(record)
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+
+        if chunk:
+            yield chunk
+
     def users_backup(self, path, db_users_bkp, db_munlist):
         '''
-        Function to check whether there are backups.
+        Function to check whether there are backups: the users JSON backup and the users
+        change log written by the users pipeline.
         params:
             - path: relative path to the backup file.
         Output: 
@@ -568,36 +853,50 @@ class DatabaseCreation:
         '''
         try:
             self.api_logger.info('Data job: Check if backup exists.')
-            #Create complete path:
+            #Create complete paths:
+            users_log = UsersLog(path + 'get_users/users_log/')
             path = path + 'get_users/db_users_' + db_users_bkp + '.json'
-            #Check if file exist:
+            #Check if files exist:
+            sources = []
             if os.path.isfile(path):
                 self.api_logger.info('Data job: Users backup exists. Loading file: ' + path)
-                #If file exist, open:
-                with open(path, 'r') as f:
-                    #Normalize json to pandas:
-                    df = pd.json_normalize(json.load(f))
-                    df.rename(columns={'location':'smi_str_location'}, inplace = True)
-                    #Filter users by locaiton:
-                    df = self.filter_usrs_loc(df, 'smi_str_location', db_munlist)
-                    self.api_logger.info('Data Engineering job: Observations after filter: ' + str(df.shape[0]))
-                    #Check if backup has lookup column:
-                    if 'smi_str_fflastlookup' not in df:
-                        df['smi_str_fflastlookup'] = ''
-                    #Select columns:
-                    df = df[['id', 'screenName', 'followersCount', 'friendsCount', 'protected', 'smi_str_location', 'lang', 'smi_str_fflastlookup']]
-                    df = df.reset_index(drop=True)
-                    #Rename columns to database format:
-                    df.rename(columns={'id':'smi_str_userid',
-                                   'screenName':'smi_str_username',
-                                   'followersCount':'smi_int_followers',
-                                   'friendsCount':'smi_int_friends',
-                                   'protected':'smi_bool_protected',
-                                   'location':'smi_str_location',
-                                   'lang':'smi_str_lang',
-                                    }, inplace=True)
-                    check = True
-                    self.api_logger.info('Data job: Users backup from json file retrieved.')
+                sources.append(self.iter_json_records(path))
+            if users_log.exists():
+                self.api_logger.info('Data job: Users change log exists. Loading log: ' + users_log.path)
+                sources.append(users_log.iter_records(self.batch_size))
+
+            if len(sources) > 0:
+                #Read the backups by chunks filtering users by location:
+                cols = ['smi_str_userid', 'smi_str_username', 'smi_int_followers', 'smi_int_friends', 
+                        'smi_bool_protected', 'smi_str_location', 'smi_str_lang', 'smi_str_lastlookup']
+                dfs = []
+                for source in sources:
+                    for chunk in source:
+                        #Normalize json to pandas, renaming the old backup columns to database format:
+                        df = pd.json_normalize(chunk)
+                        df.rename(columns={'id':'smi_str_userid',
+                                       'screenName':'smi_str_username',
+                                       'followersCount':'smi_int_followers',
+                                       'friendsCount':'smi_int_friends',
+                                       'protected':'smi_bool_protected',
+                                       'location':'smi_str_location',
+                                       'lang':'smi_str_lang',
+                                       'smi_str_fflastlookup':'smi_str_lastlookup'
+                                        }, inplace=True)
+                        #Check if backup has lookup column:
+                        if 'smi_str_lastlookup' not in df:
+                            df['smi_str_lastlookup'] = ''
+                        #Filter users by location:
+                        dfs.append(self.filter_usrs_loc(df[cols].copy(), 'smi_str_location', db_munlist))
+                if len(dfs) > 0:
+                    df = pd.concat(dfs, axis=0)
+                else:
+                    df = pd.DataFrame(columns=cols)
+                self.api_logger.info('Data Engineering job: Observations after filter: ' + str(df.shape[0]))
+                #Users on both backups are kept once:
+                df = df.drop_duplicates(subset=['smi_str_username'], keep='last').reset_index(drop=True)
+                check = True
+                self.api_logger.info('Data job: Users backup from json file retrieved.')
             else:
                 self.api_logger.info('Data job: Users backup does not exists. ')
                 df = pd.DataFrame()
@@ -611,6 +910,39 @@ class DatabaseCreation:
 
     ## TEXT TREATMENT FUNCTIONS:
 
+    def get_lexicons(self, path, stops, files, artifact = '/lexicons.pkl'):
+        '''
+        Function to load the stopwords, the filtering words and their compiled cleaner from
+        the lexicons artifact, it's compiled again when the source files change.
+        params:
+            - path: route where the stopwords, filtering words and artifact files would be.
+            - stops: list of the files containing stopwords.
+            - files: list of the files containing filtering words.
+            - artifact: name of the compiled lexicons file.
+        output: tuple (stopwords list treated, filtering words list).
+        '''
+        sources = [path + file for file in stops + files]
+        key = ('lexicons', 1, self.ecofilter_mode)
+        payload = load_artifact(path + artifact, sources, key)
+
+        if payload is None:
+            self.api_logger.info('Data job: Compiling lexicons artifact.')
+            stopw = self.get_stops(path, stops)
+            ecolist = self.get_ecofilter(path, files)
+            if stopw is None or ecolist is None:
+                return(stopw, ecolist)
+            payload = (stopw, ecolist, TweetCleaner(stopw, ecolist, self.ecofilter_mode))
+            try:
+                save_artifact(path + artifact, sources, key, payload)
+            except Exception as error:
+                self.api_logger.exception(error)
+        else:
+            self.api_logger.info('Data job: Lexicons loaded from artifact.')
+
+        #The compiled cleaner is reused while these lists are given:
+        self.cleaner = payload
+        return(payload[0], payload[1])
+
     def get_stops(self, path, stops):
         '''
         Function to load and treat stopwords.
@@ -656,6 +988,22 @@ class DatabaseCreation:
 
             self.api_logger.exception(error)
 
+    def get_cleaner(self, stopw, ecol):
+        '''
+        Function to get the tweets cleaner of the stopwords and filtering words lists
+        (matched with the ecofilter mode), it's compiled once and reused while the
+        same lists are given.
+        params:
+            - stopw: stopwords list.
+            - ecol: filtering words list.
+        output: TweetCleaner instance.
+        '''
+        cached = self.cleaner
+        if cached is None or cached[0] is not stopw or cached[1] is not ecol:
+            cached = (stopw, ecol, TweetCleaner(stopw, ecol, self.ecofilter_mode))
+            self.cleaner = cached
+        return(cached[2])
+
     def tweet_cleaner(self, tweet, stopw, ecol):
         '''
         Function to treat the text of a tweet.
@@ -663,44 +1011,21 @@ class DatabaseCreation:
             - tweet: the document itself.
         output: the tweet cleaned.
         '''
-        # Remove urls (http in advance)
-        tweet = re.sub(r'http.*',"", tweet)
-        tweet = re.sub(r'pic.twitter\S+', '', tweet)
-        # Remove mentions and hastags.
-        tweet = re.sub(r'#\S+', '', tweet)
-        tweet = re.sub(r'@\S+', '', tweet)
-        # Remove spanish vowel accents.
-        tweet = ' '.join([self.accent_rem(word) for word in tweet.split()])
-        # Remove special characters.
-        tweet = ' '.join(re.sub("(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)"," ", tweet).split())
-        # Lower captions.
-        tweet = tweet.lower()
-        # Remove numbers.
-        tweet = ''.join([i for i in tweet if not i.isdigit()])
-        # Remove white spaces.
-        tweet = re.sub(' +', ' ', tweet)
-        # Remove stopwords.
-        tweet = ' '.join([word for word in tweet.split() if not word in stopw])
-        # Filter words length (<1 and >15).
-        tweet = ' '.join([word for word in tweet.split() if len(word) > 1 and len(word) <= 15])
-        # Filter ecolist.
-        commons = [word for word in ecol if word in tweet]
-        if len(commons) < 1:
-            tweet = ''
-        #if len(tweet) > 1:
-        #   #Lemmatize:
-        #    tweet = ' '.join([tok.lemma_.lower() for tok in nlp(tweet)])
-        return tweet
-
-    def treat_text(self, df, text_col, stopw = [], ecol =[], date_col = 'date', sent_col = 'sentiment'):
+        return self.get_cleaner(stopw, ecol).clean(tweet)
+
+    def treat_text(self, df, text_col, stopw = [], ecol =[], date_col = 'date', sent_col = 'sentiment', terms_col = None, workers = None):
         '''
         Function to treat text columns:
         params:
             - df: dataframe to treat.
             - text_col: name of the text columns to treat.
             - ecolist
+            - terms_col: name of the column to keep the filtering words found on each text (joined by ', ').
+            - workers: number of processes cleaning the text (text_workers by default, 0 or 1 to clean on this process).
+              Less than text_parallel_min texts are cleaned on this process.
         Output: Dataframe treated.
         '''
+        workers = self.text_workers if workers is None else workers
         try:
 
             # Sanity checks :
@@ -719,10 +1044,20 @@ class DatabaseCreation:
             #Column text treatment:
             self.api_logger.info('Text mining job: Treat text column.')
             df[text_col] = df[text_col].fillna(' ')
-            df[text_col] = df[text_col].apply(lambda r: self.tweet_cleaner(r, stopw, ecol))
+            if workers is not None and workers > 1 and df.shape[0] >= max(1, self.text_parallel_min):
+                df[text_col], terms = self.clean_parallel(df[text_col].to_list(), stopw, ecol, workers)
+            elif terms_col is None:
+                df[text_col] = self.get_cleaner(stopw, ecol).clean_many(df[text_col])
+            else:
+                df[text_col], terms = self.get_cleaner(stopw, ecol).clean_many(df[text_col], terms = True)
+            if terms_col is not None:
+                df[terms_col] = [', '.join(found) for found in terms]
             df = df[df[text_col] != '']
+            if self.lemmatizer is not None and df.shape[0] > 0:
+                self.api_logger.info('Text mining job: Lemmatize text column.')
+                df[text_col] = self.lemmatizer.lemmatize_many(df[text_col])
             if text_col == 'text':
-                df = df[['username', 'date', 'text']]
+                df = df[[col for col in ['id', 'username', 'date', 'text', terms_col] if col in df]]
             df = df.reset_index(drop=True)
             return(df)
             
@@ -730,6 +1065,58 @@ class DatabaseCreation:
 
             self.api_logger.exception(error)
     
+    def get_clean_pool(self, stopw, ecol, workers):
+        '''
+        Function to get the text cleaning process pool of the lexicons, it's started once
+        and reused while the same lists and number of processes are given.
+        params:
+            - stopw: list with stop words to remove.
+            - ecol: list of terms which a text must contain at least one.
+            - workers: number of processes.
+        output: ProcessPoolExecutor instance.
+        '''
+        cached = self.clean_pool
+        if cached is None or cached[0] is not stopw or cached[1] is not ecol or cached[2] != workers:
+            self.close_clean_pool()
+            self.api_logger.info('Text mining job: Starting ' + str(workers) + ' text cleaning processes.')
+            cached = (stopw, ecol, workers, ProcessPoolExecutor(max_workers=workers, 
+                                                                initializer=init_cleaner_worker, 
+                                                                initargs=(stopw, ecol, self.ecofilter_mode)))
+            self.clean_pool = cached
+        return(cached[3])
+
+    def close_clean_pool(self):
+        '''
+        Function to stop the text cleaning processes, if they were started.
+        '''
+        if self.clean_pool is not None:
+            self.clean_pool[3].shutdown()
+            self.clean_pool = None
+
+    def clean_parallel(self, texts, stopw, ecol, workers, chunk_size = 5000):
+        '''
+        Function to clean texts on the text cleaning process pool. The lexicons are shipped
+        once to each process (pool initializer), the tasks only carry the chunks of texts.
+        params:
+            - texts: list of documents.
+            - stopw: list with stop words to remove.
+            - ecol: list of terms which a text must contain at least one.
+            - workers: number of processes.
+            - chunk_size: maximum number of texts of each task.
+        output: tuple (list of the texts cleaned, list of the filtering words found on each text), on input order.
+        '''
+        chunk_size = max(1, min(chunk_size, -(-len(texts) // (workers * 4))))
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        self.api_logger.info('Text mining job: Cleaning ' + str(len(texts)) + ' texts on ' + str(workers) + ' processes.')
+
+        cleaned, terms = [], []
+        executor = self.get_clean_pool(stopw, ecol, workers)
+        #Results are yielded on the chunks order:
+        for chunk_cleaned, chunk_terms in executor.map(clean_chunk, chunks):
+            cleaned.extend(chunk_cleaned)
+            terms.extend(chunk_terms)
+        return(cleaned, terms)
+
     def gp_date_tweets(self, df_input):
         '''
         Function to group and concat tweet dates from each user:
@@ -754,6 +1141,89 @@ class DatabaseCreation:
         except Exception as error:
             self.api_logger.exception(error)
 
+    def days_bitmap(self, dates):
+        '''
+        Function to encode a list of days as a coverage bitmap.
+        params:
+            - dates: list of days ('YYYY-MM-DD', longer date strings are truncated).
+        output: string of bits, bit i is '1' if the day COVERAGE_START + i is on the list.
+        '''
+        start = dt.strptime(COVERAGE_START, '%Y-%m-%d')
+        idx = set()
+        for date in dates:
+            try:
+                idx.add((dt.strptime(date.strip()[:10], '%Y-%m-%d') - start).days)
+            except ValueError:
+                continue
+        idx = [i for i in idx if i >= 0]
+        bits = ['0'] * (max(idx) + 1 if len(idx) > 0 else 0)
+        for i in idx:
+            bits[i] = '1'
+        return(''.join(bits))
+
+    def insert_coverage(self, df_dt):
+        '''
+        Function to mark the tweet dates of each user as scraped on the coverage table.
+        params:
+            - df_dt: dataframe with columns 'smi_str_username' and 'smi_str_datetweets' 
+                     (dates joined by ', ', as given by gp_date_tweets).
+        output: number of users marked, None if the upsert failed.
+        '''
+        df = df_dt.groupby('smi_str_username', as_index=False).agg({'smi_str_datetweets': ', '.join})
+        df['smi_bit_days'] = df['smi_str_datetweets'].apply(lambda r: self.days_bitmap(r.split(',')))
+        return self.bulk_upsert_to_postgres(self.queries_path + 'SMI_coverage_bulk_insertion.sql', 
+                                     df[['smi_str_username', 'smi_bit_days']], 'smi_date_coverage')
+
+    def tweet_keys(self, df):
+        '''
+        Function to format treated tweets as the tweets table, adding their unique key:
+        the md5 of user, date and text, the same rule of SMI_tweets_key_migration.sql
+        (null values as empty strings), so every tweet has one key whatever its source.
+        params:
+            - df: dataframe with columns 'username', 'date', 'text' and optionally 'ecoterms'.
+        output: dataframe with the tweets table columns.
+        '''
+        dates = ['' if pd.isnull(date) else pd.Timestamp(date).strftime('%Y-%m-%d %H:%M:%S') for date in df['date']]
+        users = ['' if pd.isnull(user) else str(user) for user in df['username']]
+        texts = ['' if pd.isnull(text) else str(text) for text in df['text']]
+        keys = [hashlib.md5('|'.join([user, date, text]).encode('utf-8')).hexdigest() 
+                for user, date, text in zip(users, dates, texts)]
+
+        output = df[['username', 'date', 'text']].rename(columns={'username':'smi_str_username',
+                                                                 'date':'smi_ts_date',
+                                                                 'text':'smi_str_tweet'})
+        output['smi_str_tweetkey'] = keys
+        if 'ecoterms' in df:
+            output['smi_str_ecoterms'] = df['ecoterms']
+        return(output)
+
+    def clean_tweets_input(self, df, df_users, stopw, ecolist):
+        '''
+        Function to format the tweets of a backup dataframe before inserting them on database.
+        params:
+            - df: tweets dataframe, with at least columns 'username', 'date' and 'text'.
+            - df_users: dataframe with the users on db ('smi_str_username' column).
+            - stopw: list with stop words to remove.
+            - ecolist: list of terms which a tweet must contain at least one.
+        output: 
+            - df_dt: distinct tweet dates by user, ready for the date coverage table.
+            - df: tweets treated with their unique key, ready for the tweets table.
+        '''
+        #Select only those tweets with a related user on db:
+        df = df.merge(df_users, 
+                        left_on = 'username', 
+                        right_on = 'smi_str_username', 
+                        how = 'inner')[[col for col in ['id', 'date', 'text', 'username'] if col in df]]
+
+        ## DISTINCT DATES BY USER:
+        df_dt = self.gp_date_tweets(df).rename(columns={'smi_str_date':'smi_str_datetweets'})
+
+        # Once the file is loaded, the tweets are treated.
+        df = self.treat_text(df, 'text', stopw, ecolist, date_col = None, sent_col = None, terms_col = 'ecoterms')
+
+        df = df[df["text"] != '']
+        return(df_dt, self.tweet_keys(df))
+
     def format_tweets_input(self, path, dir, file, df_users, stopw, ecolist):
         '''
         Function to insert tweets on database after format them from 
@@ -764,35 +1234,117 @@ class DatabaseCreation:
             - file: name of the file
         '''
         try:
-            # Provided the parameters, it loads the json file.
-            with open(path + dir + '/' + file, 'r') as f:
-                df = pd.DataFrame(json.load(f))
-            
-            #Select only those tweets with a related user on db:
-            df = df.merge(df_users, 
-                            left_on = 'username', 
-                            right_on = 'smi_str_username', 
-                            how = 'inner')[['date', 'text', 'username']]
-
-            ## INSERT DISTINCT DATES INTO DB:
-            df_dt = self.gp_date_tweets(df)
-            self.datetweet_to_postgres(self.queries_path + 'SMI_datetweets_dates_insertion.sql', df_dt)
+            # Provided the parameters, it reads the json file by chunks.
+            for chunk in self.iter_json_records(path + dir + '/' + file):
 
-            # Once the file is loaded, the tweets are treated.
-            df = self.treat_text(df, 'text', stopw, ecolist, date_col = None, sent_col = None)
+                df_dt, df = self.clean_tweets_input(pd.DataFrame(chunk), df_users, stopw, ecolist)
 
-            # Once the text is treated, it is persisted on the database.
-            if df.shape[0] > 0:
+                ## INSERT DISTINCT DATES INTO DB:
+                self.insert_coverage(df_dt)
 
-                df = df[df["text"] != '']
-                df = df[['username', 'date', 'text']]
+                # Once the text is treated, it is persisted on the database.
+                if df.shape[0] > 0:
 
-                # Insert date tweets into table on DB:
-                self.df_to_postgres(df, 'smi_tweets')
+                    # Insert date tweets into table on DB:
+                    self.bulk_upsert_to_postgres(self.queries_path + 'SMI_tweets_bulk_insertion.sql', df, 'smi_tweets')
 
         except Exception as error:
             print(error)
 
+    ## BULK LOADER FUNCTIONS:
+
+    def __getstate__(self):
+        '''
+        Function to pickle the instance for the bulk loader workers, without
+        the database connection, the twitter API handlers and the text cleaning pool.
+        '''
+        state = self.__dict__.copy()
+        for key in ['conn', 'cur', 'api', 'session', 'clean_pool']:
+            state[key] = None
+        return(state)
+
+    def file_digest(self, path, chunk_size = 1 << 20):
+        '''
+        Function to hash a file by chunks.
+        params:
+            - path: path to the file.
+            - chunk_size: bytes read on each step.
+        output: sha1 hex digest of the file content.
+        '''
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return(digest.hexdigest())
+
+    def file_entry(self, path):
+        '''
+        Function to describe a backup file for the loader manifest.
+        params:
+            - path: path to the file.
+        output: dictionary with path, size and mtime of the file (hash not computed).
+        '''
+        stat = os.stat(path)
+        return({'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': None})
+
+    def read_manifest(self, path):
+        '''
+        Function to read the manifest of completed backup files (JSON lines).
+        params:
+            - path: path to the manifest file.
+        output: dictionary of completed file entries by path.
+        '''
+        manifest = {}
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        manifest[entry['path']] = entry
+        return(manifest)
+
+    def append_manifest(self, path, entry):
+        '''
+        Function to record a completed backup file on the loader manifest.
+        params:
+            - path: path to the manifest file.
+            - entry: file entry (path, size, mtime, hash).
+        '''
+        with open(path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def is_completed(self, entry, manifest):
+        '''
+        Function to check whether a backup file was already loaded.
+        params:
+            - entry: file entry (path, size, mtime).
+            - manifest: dictionary of completed file entries by path.
+        output: boolean, True if the file content is already on DB.
+        '''
+        done = manifest.get(entry['path'])
+        if done is None or done['size'] != entry['size']:
+            return(False)
+        if done['mtime'] == entry['mtime']:
+            return(True)
+        #Touched file, compare the content:
+        return(done['hash'] == self.file_digest(entry['path']))
+
+    def parse_tweets_file(self, entry, df_users, stopw, ecolist):
+        '''
+        Function to parse and clean a tweets backup file by chunks, without DB access (worker side).
+        params:
+            - entry: file entry (path, size, mtime).
+            - df_users: dataframe with the users on db ('smi_str_username' column).
+            - stopw: list with stop words to remove.
+            - ecolist: list of terms which a tweet must contain at least one.
+        output: generator of the distinct tweet dates by user and tweets treated of each chunk.
+        '''
+        for chunk in self.iter_json_records(entry['path']):
+            df_dt, df = self.clean_tweets_input(pd.DataFrame(chunk), df_users, stopw, ecolist)
+            yield(df_dt, df)
+
     ## INSERTION FUNCTIONS:
 
     def insert_munlist(self, temp_data_path):
@@ -813,13 +1365,20 @@ class DatabaseCreation:
                 with open(path_munlist, 'r') as f:
 
                     self.api_logger.info('Data job: Retrieve municipalities file.')
-                    df = pd.DataFrame(json.load(f), columns=['location'])
+                    # Names list, or records with 'location' and optionally 'province' and 'region':
+                    records = [r if isinstance(r, dict) else {'location': r} for r in json.load(f)]
+                    df = pd.DataFrame(records, columns=['location', 'province', 'region'])
                     df['location'] = df['location'].replace(',','', regex=True)
                     self.api_logger.info('Data job: Municipalities number of observations: ' + str(df.shape[0]) + ' observations.')
-                    df.drop_duplicates(inplace = True)
+                    df.drop_duplicates(subset = ['location'], inplace = True)
                     self.api_logger.info('Data job: Drop duplicates of unicipalities: ' + str(df.shape[0]) + ' observations.')
+                    df['location_norm'] = df['location'].apply(normalize_location)
+                    df = df.rename(columns={'location':'smi_str_location',
+                                            'location_norm':'smi_str_location_norm',
+                                            'province':'smi_str_province',
+                                            'region':'smi_str_region'})
                     self.api_logger.info('Database job: Insert municipalities into DB.')
-                    self.df_to_postgres(df, self.munlist_table)
+                    self.bulk_upsert_to_postgres(self.queries_path + 'SMI_munlist_bulk_insertion.sql', df, 'smi_munlist')
                     self.api_logger.info('Database job: Municipalities inserted into DB.')
             
             else:
@@ -860,13 +1419,13 @@ class DatabaseCreation:
                     if df_usr_check:
                         # Users table insertion:
                         self.api_logger.info('Database job: Users backup exists, insert into DB.')
-                        self.eachrow_to_postgres(self.queries_path + 'SMI_usrs_insertion.sql', df)
+                        self.bulk_upsert_to_postgres(self.queries_path + 'SMI_usrs_bulk_insertion.sql', df, 'smi_users')
                         self.api_logger.info('Database job: Users table inserted on DB.')
                         # Users to date_tweets:
                         self.api_logger.info('Database job: Insert users into date tweets DB table.')
                         df['smi_str_datetweets'] = ''
                         df = df[['smi_str_username', 'smi_str_datetweets']]
-                        self.eachrow_to_postgres(self.queries_path + 'SMI_datetweets_users_insertion.sql', df)
+                        self.bulk_upsert_to_postgres(self.queries_path + 'SMI_datetweets_users_bulk_insertion.sql', df, 'smi_date_tweets')
                         self.api_logger.info('Database job: Users inserted into date tweets DB table.')
                         
                     else:
@@ -902,13 +1461,13 @@ class DatabaseCreation:
                 if df_usr_check:
                     # Users table insertion:
                     self.api_logger.info('Database job: Users backup exists, insert into DB.')
-                    self.eachrow_to_postgres(self.queries_path + 'SMI_usrs_insertion.sql', df)
+                    self.bulk_upsert_to_postgres(self.queries_path + 'SMI_usrs_bulk_insertion.sql', df, 'smi_users')
                     self.api_logger.info('Database job: Users table inserted on DB.')
                     # Users to date_tweets:
                     self.api_logger.info('Database job: Insert users into date tweets DB table.')
                     df['smi_str_datetweets'] = ''
                     df = df[['smi_str_username', 'smi_str_datetweets']]
-                    self.eachrow_to_postgres(self.queries_path + 'SMI_datetweets_users_insertion.sql', df)
+                    self.bulk_upsert_to_postgres(self.queries_path + 'SMI_datetweets_users_bulk_insertion.sql', df, 'smi_date_tweets')
                     self.api_logger.info('Database job: Users inserted into date tweets DB table.')
                 else:
                     self.api_logger.info('Data job: Users backup does not exists, insert into db.')
@@ -964,11 +1523,18 @@ class DatabaseCreation:
             self.api_logger.info('Data job: Corpus file not found, please provide a corpus json file.')
             self.api_logger.exception(error)
 
-    def insert_tweets(self, temp_data_path, stopw, ecolist):
+    def insert_tweets(self, temp_data_path, stopw, ecolist, workers = 0):
         '''
         Function to insert tweets into DB.
-        params: self referenced, no params.
+        params: 
+            - temp_data_path: path to data folder.
+            - stopw: list with stop words to remove.
+            - ecolist: list of terms which a tweet must contain at least one.
+            - workers: number of loader processes, 0 to insert the files one by one.
         '''
+        if workers > 0:
+            return(self.bulk_insert_tweets(temp_data_path, stopw, ecolist, workers))
+
         try:
 
             self.api_logger.info('Database job: Getting number of observation of tweets table.')
@@ -986,11 +1552,10 @@ class DatabaseCreation:
                         self.api_logger.info('Database job: Inserting file on DB: ' + file)
                         self.format_tweets_input(path_tweets, dire, file, df_usrs, stopw, ecolist)
                         self.api_logger.info('Database job: File inserted on DB: ' + file)
-                        n_obs = self.fetchone_SQL(self.queries_path + 'SMI_tweets_count.sql')
-                        self.api_logger.info('Database job: Number of observations in the tweets table on DB before droping duplicates: ' + str(n_obs))
-                        self.query_SQL(self.queries_path + 'SMI_tweets_remove_dups.sql')
-                        n_obs = self.fetchone_SQL(self.queries_path + 'SMI_tweets_count.sql')
-                        self.api_logger.info('Database job: Number of observations in the tweets table on DB after droping duplicates: ' + str(n_obs))
+
+                # Duplicated tweets are skipped on insertion by the unique tweet key:
+                n_obs = self.fetchone_SQL(self.queries_path + 'SMI_tweets_count.sql')
+                self.api_logger.info('Database job: Number of observations in the tweets table on DB: ' + str(n_obs))
                     
             else:
                 self.api_logger.info('Database job: Tweets table already filled.')
@@ -998,4 +1563,166 @@ class DatabaseCreation:
         except Exception as error:
 
             self.api_logger.info('Data job: Tweets backup files not found, please provide tweets json file.')
-            self.api_logger.exception(error)
\ No newline at end of file
+            self.api_logger.exception(error)
+
+    def bulk_insert_tweets(self, temp_data_path, stopw, ecolist, workers):
+        '''
+        Function to insert the tweets backups into DB with a pool of loader processes.
+        The files are parsed and treated by the workers and copied into DB by this process,
+        each completed file is recorded on a manifest so an interrupted load resumes.
+        Duplicated tweets are skipped on insertion by the unique tweet key.
+        params:
+            - temp_data_path: path to data folder.
+            - stopw: list with stop words to remove.
+            - ecolist: list of terms which a tweet must contain at least one.
+            - workers: number of loader processes.
+        '''
+        try:
+
+            path_manifest = temp_data_path + 'db_creation/tweets_manifest.jsonl'
+            if not os.path.isdir(temp_data_path + 'db_creation/'):
+                os.makedirs(temp_data_path + 'db_creation/')
+
+            self.api_logger.info('Database job: Getting number of observation of tweets table.')
+            n_obs = self.fetchone_SQL(self.queries_path + 'SMI_tweets_count.sql')
+            self.api_logger.info('Database job: Number of observation on tweets table: ' + str(n_obs))
+
+            if n_obs > 0 and not os.path.isfile(path_manifest):
+                self.api_logger.info('Database job: Tweets table already filled.')
+                return
+
+            #Query users:
+            df_usrs = pd.DataFrame(self.fetchall_SQL(self.queries_path + 'SMI_usrs_query.sql')).rename(columns = {0:'smi_str_username'})
+
+            #List backup files, skipping the ones already loaded:
+            path_tweets = temp_data_path + 'get_tweets/'
+            manifest = self.read_manifest(path_manifest)
+            entries = [self.file_entry(path_tweets + dire + '/' + file) 
+                        for dire in sorted(os.listdir(path_tweets)) 
+                        for file in sorted(os.listdir(path_tweets + dire + '/'))]
+            pending = [entry for entry in entries if not self.is_completed(entry, manifest)]
+            self.api_logger.info('Database job: Tweets backup files: ' + str(len(entries)) + 
+                                 ', already loaded: ' + str(len(entries) - len(pending)) + '.')
+
+            #Parse files on the pool, the chunks come back through a bounded queue:
+            results = multiprocessing.Queue(maxsize = 2 * workers)
+            with ProcessPoolExecutor(max_workers=workers, 
+                                     initializer=init_loader_worker, 
+                                     initargs=(self, df_usrs, stopw, ecolist, results)) as executor:
+                futures = {executor.submit(load_tweets_file, entry): entry for entry in pending}
+                finished, failed, n_tweets = set(), set(), {}
+                while len(finished) < len(futures):
+                    try:
+                        kind, entry, df_dt, df, lemmas = results.get(timeout = 5)
+                    except queue.Empty:
+                        #Files of workers which died without reporting:
+                        for future, entry in futures.items():
+                            if entry['path'] not in finished and future.done() and future.exception() is not None:
+                                self.api_logger.error('Database job: File not inserted on DB: ' + entry['path'], exc_info=future.exception())
+                                finished.add(entry['path'])
+                        continue
+
+                    # Keep the lemmas learned by the worker:
+                    if self.lemmatizer is not None:
+                        self.lemmatizer.update(lemmas)
+
+                    if kind == 'chunk':
+                        # Insert distinct dates and tweets of the chunk into DB:
+                        if self.insert_coverage(df_dt) is None:
+                            failed.add(entry['path'])
+                        if df.shape[0] > 0:
+                            if self.bulk_upsert_to_postgres(self.queries_path + 'SMI_tweets_bulk_insertion.sql', df, 'smi_tweets') is None:
+                                failed.add(entry['path'])
+                        n_tweets[entry['path']] = n_tweets.get(entry['path'], 0) + df.shape[0]
+
+                    elif kind == 'done':
+                        finished.add(entry['path'])
+                        # The file is completed once all its chunks are on DB, otherwise it's loaded again on the next run:
+                        if entry['path'] in failed:
+                            n_tweets.pop(entry['path'], None)
+                            self.api_logger.error('Database job: File not inserted on DB, some chunks failed: ' + entry['path'])
+                            continue
+                        self.append_manifest(path_manifest, entry)
+                        self.api_logger.info('Database job: File inserted on DB: ' + entry['path'] + ' (' + str(n_tweets.pop(entry['path'], 0)) + ' tweets).')
+
+                    else:
+                        # The chunks already inserted are skipped on the next load by the unique tweet key:
+                        finished.add(entry['path'])
+                        self.api_logger.error('Database job: File not inserted on DB: ' + entry['path'] + ': ' + df_dt)
+
+        except Exception as error:
+
+            self.api_logger.info('Data job: Tweets backup files not found, please provide tweets json file.')
+            self.api_logger.exception(error)
+
+
+## BULK LOADER WORKERS:
+
+# State of each loader process, set once by the pool initializer:
+loader_state = {}
+
+def init_loader_worker(pipeline, df_users, stopw, ecolist, results):
+    '''
+    Function to initialize a loader process with the data shared by all its files.
+    params:
+        - pipeline: DatabaseCreation instance (pickled without DB connection).
+        - df_users: dataframe with the users on db.
+        - stopw: list with stop words to remove.
+        - ecolist: list of terms which a tweet must contain at least one.
+        - results: bounded queue where the chunks are sent to the parent process.
+    '''
+    #The files are already cleaned in parallel, each one on a single process:
+    pipeline.text_workers = 0
+    #The new lemmas are shipped to the parent process, which persists the cache:
+    if pipeline.lemmatizer is not None:
+        pipeline.lemmatizer.learn()
+    loader_state.update(pipeline=pipeline, df_users=df_users, stopw=stopw, ecolist=ecolist, results=results)
+
+def load_tweets_file(entry):
+    '''
+    Function to parse and clean a tweets backup file on a loader process, sending each
+    chunk to the parent process as soon as it is treated (the queue is bounded, so
+    a worker waits while the parent is behind), then the end of the file.
+    params:
+        - entry: file entry (path, size, mtime).
+    Messages: ('chunk', entry, distinct tweet dates by user, tweets treated, new lemmas),
+              ('done', entry with its hash, None, None, new lemmas) or ('error', entry, message, None, []).
+    '''
+    pipeline = loader_state['pipeline']
+    results = loader_state['results']
+    try:
+        entry = dict(entry, hash=pipeline.file_digest(entry['path']))
+        for df_dt, df in pipeline.parse_tweets_file(entry, 
+                                                    loader_state['df_users'], 
+                                                    loader_state['stopw'], 
+                                                    loader_state['ecolist']):
+            lemmas = pipeline.lemmatizer.drain() if pipeline.lemmatizer is not None else []
+            results.put(('chunk', entry, df_dt, df, lemmas))
+        lemmas = pipeline.lemmatizer.drain() if pipeline.lemmatizer is not None else []
+        results.put(('done', entry, None, None, lemmas))
+    except Exception as error:
+        results.put(('error', entry, repr(error), None, []))
+
+## TEXT CLEANING WORKERS:
+
+# State of each text cleaning process, set once by the pool initializer:
+cleaner_state = {}
+
+def init_cleaner_worker(stopw, ecol, mode):
+    '''
+    Function to initialize a text cleaning process, compiling the lexicons once.
+    params:
+        - stopw: list with stop words to remove.
+        - ecol: list of terms which a text must contain at least one.
+        - mode: filtering words matching mode ('substring' or 'token').
+    '''
+    cleaner_state['cleaner'] = TweetCleaner(stopw, ecol, mode)
+
+def clean_chunk(texts):
+    '''
+    Function to clean a chunk of texts on a text cleaning process.
+    params:
+        - texts: list of documents.
+    output: tuple (list of the texts cleaned, list of the filtering words found on each text).
+    '''
+    return(cleaner_state['cleaner'].clean_many(texts, terms = True))
@@ -0,0 +1,149 @@
+import time
+import hashlib
+
+
+class FakeUser:
+    '''
+    Twitter user stand-in, with the attributes of a tweepy User used by the pipelines.
+    '''
+    def __init__(self, user_id, screen_name, followers_count, friends_count, protected, location, lang):
+
+        self.id = user_id
+        self.screen_name = screen_name
+        self.followers_count = followers_count
+        self.friends_count = friends_count
+        self.protected = protected
+        self.location = location
+        self.lang = lang
+        self._json = {'id': user_id,
+                      'screen_name': screen_name,
+                      'followers_count': followers_count,
+                      'friends_count': friends_count,
+                      'protected': protected,
+                      'location': location,
+                      'lang': lang}
+
+
+class FakeAPI:
+    '''
+    Offline stand-in of the tweepy API for benchmarks and local runs: the users and
+    their followers and friends (ids in a bounded id space, so neighbourhoods overlap)
+    are generated deterministically from their screen names (or ids), and each call
+    waits a fixed latency, counting the calls made.
+    '''
+    def __init__(self,
+                latency = 0.2,
+                locations = ('Madrid', 'Barcelona, España', 'Sevilla', 'Valencia', 'London', 'Buenos Aires', ''),
+                missing_every = 50,
+                id_space = 200000,
+                max_neighbours = 2000
+                ):
+
+        #Local parameters
+        self.latency = latency
+        self.locations = locations
+        self.missing_every = missing_every
+        self.id_space = id_space
+        self.max_neighbours = max_neighbours
+        self.calls = {}
+
+    def call(self, method):
+        '''
+        Function to count and wait an API call.
+        params:
+            - method: name of the API method.
+        '''
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def make_user(self, screen_name = None, user_id = None):
+        '''
+        Function to generate a user, the same for the same screen name (or id).
+        params:
+            - screen_name: user screen name.
+            - user_id: user id.
+        Output: FakeUser, None for one of each missing_every users (not found).
+        '''
+        seed = int(hashlib.md5(str(screen_name if screen_name is not None else user_id).lower().encode('utf-8')).hexdigest(), 16)
+        if self.missing_every and seed % self.missing_every == 0:
+            return None
+        user_id = user_id if user_id is not None else seed % 10**15
+        screen_name = screen_name if screen_name is not None else 'user_' + str(user_id)
+        return FakeUser(user_id, screen_name, seed % 100000, (seed // 7) % 5000, seed % 11 == 0, 
+                        self.locations[seed % len(self.locations)], 'es')
+
+    def get_user(self, screen_name = None, user_id = None):
+        self.call('get_user')
+        user = self.make_user(screen_name, user_id)
+        if user is None:
+            raise Exception('User not found.')
+        return user
+
+    def lookup_users(self, screen_name = None, user_id = None):
+        self.call('lookup_users')
+        if screen_name is not None:
+            users = [self.make_user(screen_name = name) for name in screen_name[:100]]
+        else:
+            users = [self.make_user(user_id = uid) for uid in (user_id or [])[:100]]
+        return [user for user in users if user is not None]
+
+    def neighbour_ids(self, screen_name, relation):
+        '''
+        Function to generate the followers or friends ids of a user.
+        params:
+            - screen_name: user screen name.
+            - relation: 'followers' or 'friends'.
+        Output: list of user ids.
+        '''
+        user = self.make_user(screen_name)
+        if user is None:
+            raise Exception('User not found.')
+        count = min(user.followers_count if relation == 'followers' else user.friends_count, self.max_neighbours)
+        key = str(screen_name).lower() + ':' + relation + ':'
+        return [int(hashlib.md5((key + str(i)).encode('utf-8')).hexdigest(), 16) % self.id_space + 1 for i in range(count)]
+
+    def page(self, items, cursor, count):
+        '''
+        Function to get a page of items as the cursor paginated API methods (the cursor is
+        the offset of the page, -1 for the first one and 0 after the last one).
+        params:
+            - items: list of items.
+            - cursor: page cursor, None if the method is not paginated.
+            - count: items per page.
+        Output: page items, with the previous and next cursors if a cursor is given.
+        '''
+        start = 0 if cursor in (None, -1) else cursor
+        data = items[start:start + count]
+        if cursor is None:
+            return data
+        next_cursor = start + count if start + count < len(items) else 0
+        return data, (max(start - count, 0), next_cursor)
+
+    def get_follower_ids(self, screen_name = None, cursor = None, count = 5000, **kwargs):
+        self.call('get_follower_ids')
+        return self.page(self.neighbour_ids(screen_name, 'followers'), cursor, min(count, 5000))
+    get_follower_ids.pagination_mode = 'cursor'
+
+    def get_friend_ids(self, screen_name = None, cursor = None, count = 5000, **kwargs):
+        self.call('get_friend_ids')
+        return self.page(self.neighbour_ids(screen_name, 'friends'), cursor, min(count, 5000))
+    get_friend_ids.pagination_mode = 'cursor'
+
+    def get_followers(self, screen_name = None, cursor = None, count = 200, **kwargs):
+        self.call('get_followers')
+        ids = self.neighbour_ids(screen_name, 'followers')
+        data = self.page(ids, cursor, min(count, 200))
+        users = data[0] if cursor is not None else data
+        users = [user for user in (self.make_user(user_id = uid) for uid in users) if user is not None]
+        return (users, data[1]) if cursor is not None else users
+    get_followers.pagination_mode = 'cursor'
+
+    def get_friends(self, screen_name = None, cursor = None, count = 200, **kwargs):
+        self.call('get_friends')
+        ids = self.neighbour_ids(screen_name, 'friends')
+        data = self.page(ids, cursor, min(count, 200))
+        users = data[0] if cursor is not None else data
+        users = [user for user in (self.make_user(user_id = uid) for uid in users) if user is not None]
+        return (users, data[1]) if cursor is not None else users
+    get_friends.pagination_mode = 'cursor'
@@ -1,12 +1,19 @@
+from startup import StartupReport
+startup = StartupReport()
+
 import pandas as pd
 import numpy as np
-import random as rd
+startup.mark('Import pandas and numpy')
 import os
 import json
+import time
 import logging
+startup.mark('Import standard library')
 from tweepy import API, OAuthHandler
+startup.mark('Import tweepy')
 import psycopg2
 from psycopg2.extensions import register_adapter, AsIs
+startup.mark('Import psycopg2')
 
 register_adapter(np.int64, AsIs)
 register_adapter(np.bool_, AsIs)
@@ -15,6 +22,8 @@ import warnings
 warnings.filterwarnings("ignore")
 
 from utils import *
+from fake_api import FakeAPI
+startup.mark('Import utils')
 
 # GLOBAL Params:
 
@@ -34,8 +43,23 @@ queries_path = app_config['queries_path']
 logs_path = app_config['logs_path']
 temp_data_path = app_config['temp_data_path']
 nusers_sample = app_config['nusers_sample']
+# Minutes a popped user is kept out of the frontier until its lookup is updated:
+lookup_lease = app_config.get('lookup_lease', 60)
+# Seconds to wait when there are no due users:
+idle_sleep = app_config.get('idle_sleep', 60)
+# Users change log (gzip JSON lines segments, compacted into a snapshot):
+users_log_segment = app_config.get('users_log_segment', 50000)
+users_log_compact = app_config.get('users_log_compact', 10)
+# Friends and followers retrieval ('users': full users pages, 'ids': ids pages and lookup of the unseen ones),
+# with the ids already seen kept in a set or a Bloom filter:
+ff_mode = app_config.get('ff_mode', 'users')
+known_users_mode = app_config.get('known_users_mode', 'set')
+known_users_capacity = app_config.get('known_users_capacity', 10000000)
+known_users_error = app_config.get('known_users_error', 0.001)
 app_name = app_config['app_name']
 
+startup.mark('Load config')
+
 # Check and create directories:
 if not os.path.isdir(logs_path):
     os.makedirs(logs_path)
@@ -59,6 +83,11 @@ auth = OAuthHandler(consumer_key, consumer_secret)
 auth.set_access_token(access_token, access_secret)
 api = API(auth, wait_on_rate_limit=True)
 
+# Offline stand-in of the API (benchmarks and local runs):
+if app_config.get('fake_api', False):
+    api = FakeAPI(latency=app_config.get('fake_api_latency', 0.2))
+startup.mark('Twitter API connection')
+
 # Logger initialization:
 api_logger = logging.getLogger(__file__)
 file_name = dt.today().strftime('%y%m%d') + '_' + app_name + '.log'
@@ -70,6 +99,7 @@ logging.basicConfig(
         logging.FileHandler(os.path.join(logs_path, app_name, file_name)),
         logging.StreamHandler()
     ])
+startup.mark('Logger initialization')
 
 try:
 
@@ -92,33 +122,42 @@ try:
     conn.autocommit = True
     cur = conn.cursor()
     schema = db_config['db_schema']
+    startup.mark('Database connection')
 
     # Users pipeline class instance:
+    users_log = UsersLog(temp_data_path + 'get_users/users_log/', users_log_segment, users_log_compact)
+    known_users = KnownUsers(known_users_mode, known_users_capacity, known_users_error)
     upipe = UsersPipeline(queries_path, conn, schema, 
-                          api, temp_data_path, api_logger)
+                          api, temp_data_path, api_logger, lookup_lease, users_log,
+                          ff_mode, known_users)
 
-    # Get municipalities from DB:
-    db_munlist = upipe.fetchall_SQL(queries_path + 'SMI_munlist_query.sql')
-    munlist = pd.DataFrame(db_munlist, columns = ['location'])['location'].tolist()
-    db_munlist = [upipe.text_clean_loc(mun.lower().replace(',', '')) for mun in munlist]
+    # Get municipalities (normalized on DB) and build their matcher:
+    db_munlist = upipe.fetchall_SQL(queries_path + 'SMI_munlist_lookup.sql')
+    munlist = pd.DataFrame(db_munlist, columns = ['munid', 'location_norm', 'province', 'region'])
+    db_munlist = LocationMatcher(munlist['location_norm'].tolist(), munlist['munid'].tolist(), normalized = True)
+    startup.mark('Load municipalities')
+
+    # Warm the known users from DB (ids retrieval mode):
+    if ff_mode == 'ids':
+        upipe.warm_known_users()
+        startup.mark('Load known users')
 
 except (Exception, psycopg2.DatabaseError) as error:
     logging.exception(error)
 
+startup.report(api_logger)
+
 # Infinte retrieval of users:
 while True:
     try:
         logging.info('Twetter API job: Starting iteration.')
-        # Get users table from database:
-        with open(queries_path + 'SMI_query_users.sql', 'r') as f:
-            query = f.read().format(schema=schema)
-            cur.execute(query)
-            db_users = pd.DataFrame(cur.fetchall(), columns = list(users_dict.keys()))
-            db_users = db_users.astype({"smi_str_userid": object})
-            users_ls = db_users["smi_str_username"].to_list()
-
-        # Sample users on each iteration:
-        userls = rd.sample(users_ls, nusers_sample)
+        # Pop the best due users of the crawl frontier on each iteration:
+        userls = upipe.pop_users(nusers_sample)
+
+        # Wait for the next due users if the frontier is empty:
+        if len(userls) == 0:
+            logging.info('Database job: There are not due users on the crawl frontier.')
+            time.sleep(idle_sleep)
 
         # Get users loop:
         for user in userls:
@@ -0,0 +1,105 @@
+import math
+import hashlib
+
+
+class BloomFilter:
+    '''
+    Bloom filter of user ids: fixed memory for the expected number of users, with
+    false positives (never false negatives) at the given error rate.
+    '''
+    def __init__(self,
+                capacity = 10000000,
+                error_rate = 0.001
+                ):
+
+        #Local parameters
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.n_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.n_hashes = max(1, int(round(self.n_bits / capacity * math.log(2))))
+        self.bits = bytearray(self.n_bits // 8 + 1)
+        self.count = 0
+
+    def positions(self, item):
+        '''
+        Function to get the bits of an item (double hashing of a 128 bits digest).
+        params:
+            - item: user id.
+        Output: generator of bit positions.
+        '''
+        digest = hashlib.md5(str(item).encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return((h1 + i * h2) % self.n_bits for i in range(self.n_hashes))
+
+    def add(self, item):
+        for pos in self.positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return(all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(item)))
+
+    def __len__(self):
+        return(self.count)
+
+
+class KnownUsers:
+    '''
+    In-memory set of the user ids already seen (on DB or already looked up), to skip
+    them before hydrating ids. mode 'set' is exact, mode 'bloom' bounds the memory
+    and skips a few unseen users (the error rate).
+    '''
+    def __init__(self,
+                mode = 'set',
+                capacity = 10000000,
+                error_rate = 0.001
+                ):
+
+        #Local parameters
+        if mode not in ('set', 'bloom'):
+            raise ValueError('Known users mode must be "set" or "bloom", got: ' + str(mode))
+        self.mode = mode
+        self.ids = set() if mode == 'set' else BloomFilter(capacity, error_rate)
+
+    @staticmethod
+    def key(user_id):
+        '''
+        Function to normalize a user id (ids are strings on DB and integers on the API).
+        params:
+            - user_id: user id.
+        Output: integer id, or the id as string if it is not numeric.
+        '''
+        try:
+            return(int(user_id))
+        except (TypeError, ValueError):
+            return(str(user_id))
+
+    def add(self, user_id):
+        self.ids.add(self.key(user_id))
+
+    def add_many(self, user_ids):
+        for user_id in user_ids:
+            self.ids.add(self.key(user_id))
+
+    def __contains__(self, user_id):
+        return(self.key(user_id) in self.ids)
+
+    def __len__(self):
+        return(len(self.ids))
+
+    def unseen(self, user_ids):
+        '''
+        Function to filter the unseen ids, keeping their order and dropping repeated ids.
+        params:
+            - user_ids: list of user ids.
+        Output: list of unseen user ids.
+        '''
+        output = []
+        batch = set()
+        for user_id in user_ids:
+            key = self.key(user_id)
+            if key not in batch and key not in self.ids:
+                batch.add(key)
+                output.append(user_id)
+        return(output)
@@ -0,0 +1,62 @@
+-- Insert the new users found through a user, with their date tweets rows, in one statement
+-- (the users already on DB are skipped by the primary keys), returning the inserted users.
+-- The new users are scheduled ahead by the priority inherited from the user they were found through:
+
+WITH batch AS (
+    SELECT 
+        v."smi_str_userid", 
+        v."smi_str_username",
+        v."smi_int_followers"::numeric AS "smi_int_followers", 
+        v."smi_int_friends"::numeric AS "smi_int_friends", 
+        v."smi_bool_protected"::boolean AS "smi_bool_protected", 
+        v."smi_str_location", 
+        v."smi_str_lang", 
+        v."smi_str_lastlookup",
+        v."smi_flt_priority"::double precision AS "smi_flt_priority"
+    FROM (VALUES %s) AS v ("smi_str_userid", 
+                           "smi_str_username",
+                           "smi_int_followers", 
+                           "smi_int_friends", 
+                           "smi_bool_protected", 
+                           "smi_str_location", 
+                           "smi_str_lang", 
+                           "smi_str_lastlookup",
+                           "smi_flt_priority")
+),
+new_users AS (
+    INSERT INTO {schema}.smi_users ("smi_str_userid", 
+                                    "smi_str_username",
+                                    "smi_int_followers", 
+                                    "smi_int_friends", 
+                                    "smi_bool_protected", 
+                                    "smi_str_location", 
+                                    "smi_str_lang", 
+                                    "smi_str_lastlookup",
+                                    "smi_flt_priority",
+                                    "smi_ts_nextlookup")
+    SELECT 
+        b."smi_str_userid", 
+        b."smi_str_username",
+        b."smi_int_followers", 
+        b."smi_int_friends", 
+        b."smi_bool_protected", 
+        b."smi_str_location", 
+        b."smi_str_lang", 
+        b."smi_str_lastlookup",
+        b."smi_flt_priority",
+        now() - b."smi_flt_priority" * INTERVAL '30 DAYS'
+    FROM batch b
+    ON CONFLICT ("smi_str_username")
+    DO NOTHING
+    RETURNING "smi_str_username"
+),
+new_dates AS (
+    INSERT INTO {schema}.smi_date_tweets ("smi_str_username", "smi_str_datetweets")
+    SELECT b."smi_str_username", ''
+    FROM batch b
+    ON CONFLICT ("smi_str_username")
+    DO NOTHING
+    RETURNING 1
+)
+SELECT nu."smi_str_username"
+FROM new_users nu;
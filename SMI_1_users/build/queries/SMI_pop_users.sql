@@ -0,0 +1,19 @@
+-- Pop the best due users of the crawl frontier (index smi_users_nextlookup_idx): the
+-- priority moves users ahead in the schedule, and the popped users are leased until
+-- their lookup is updated:
+UPDATE {schema}.smi_users su
+SET "smi_ts_nextlookup" = now() + %(lease)s * INTERVAL '1 MINUTE'
+WHERE su."smi_str_username" IN (
+    SELECT sut."smi_str_username"
+    FROM {schema}.smi_users sut
+    WHERE sut."smi_ts_nextlookup" <= now()
+    AND sut."smi_int_followers" < 1000
+    AND sut."smi_int_followers" > 50
+    AND sut."smi_int_friends" < 1000
+    AND sut."smi_int_friends" > 50
+    AND sut."smi_bool_protected" = False
+    ORDER BY sut."smi_ts_nextlookup"
+    LIMIT %(nusers)s
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING su."smi_str_username";
@@ -1,2 +0,0 @@
-select *
-from {schema}.smi_users sut;
\ No newline at end of file
@@ -0,0 +1,3 @@
+-- Ids of the users on DB, to skip them before hydrating followers and friends ids:
+select sut."smi_str_userid"
+from {schema}.smi_users sut;
\ No newline at end of file
@@ -1,3 +1,6 @@
+-- Reschedule a looked up user in a month, earlier the higher the yield of its neighbourhood:
 UPDATE {schema}.smi_users sut
-SET "smi_str_lastlookup" = TO_CHAR(DATE(CURRENT_DATE + 1 * INTERVAL '1 MONTH'), 'YYYY-MM-DD')
-WHERE sut."smi_str_username" = (%s);
\ No newline at end of file
+SET "smi_str_lastlookup" = TO_CHAR(DATE(CURRENT_DATE + 1 * INTERVAL '1 MONTH'), 'YYYY-MM-DD'),
+    "smi_flt_priority" = %(priority)s,
+    "smi_ts_nextlookup" = now() + INTERVAL '1 MONTH' - %(priority)s * INTERVAL '15 DAYS'
+WHERE sut."smi_str_username" = %(user)s;
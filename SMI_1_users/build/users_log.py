@@ -0,0 +1,191 @@
+import os
+import re
+import sys
+import gzip
+import json
+import zlib
+
+# Segments of the log, numbered in writing order:
+SEGMENT = re.compile(r'^segment_(\d+)\.jsonl\.gz$')
+
+
+def to_native(value):
+    '''
+    Function to serialize the numpy scalars of the records.
+    params:
+        - value: value not serializable by json.
+    Output: python value.
+    '''
+    if hasattr(value, 'item'):
+        return(value.item())
+    return(str(value))
+
+
+class UsersLog:
+    '''
+    Append-only change log of the users table: the users inserted on each lookup are
+    appended to gzip JSON lines segments, which are compacted into a snapshot. There
+    must be one writer of the log at a time.
+    '''
+    def __init__(self,
+                path,
+                segment_records = 50000,
+                compact_segments = 10,
+                key = 'smi_str_username'
+                ):
+
+        #Local parameters
+        self.path = path
+        self.segment_records = segment_records
+        self.compact_segments = compact_segments
+        self.key = key
+        self.snapshot = os.path.join(path, 'snapshot.jsonl.gz')
+        self.current = None
+        self.current_records = 0
+
+    def segments(self):
+        '''
+        Function to list the segments of the log.
+        Output: list of segment paths, in writing order.
+        '''
+        if not os.path.isdir(self.path):
+            return([])
+        names = [(int(m.group(1)), name) for name in os.listdir(self.path) for m in [SEGMENT.match(name)] if m]
+        return([os.path.join(self.path, name) for _, name in sorted(names)])
+
+    def exists(self):
+        '''
+        Function to check whether there are records on the log.
+        Output: boolean.
+        '''
+        return(os.path.isfile(self.snapshot) or len(self.segments()) > 0)
+
+    def roll(self):
+        '''
+        Function to start a new segment, after the last one on disk.
+        '''
+        segments = self.segments()
+        last = int(SEGMENT.match(os.path.basename(segments[-1])).group(1)) if segments else 0
+        self.current = os.path.join(self.path, 'segment_' + str(last + 1).zfill(8) + '.jsonl.gz')
+        self.current_records = 0
+
+    def append(self, records):
+        '''
+        Function to append records to the current segment, as one gzip member (a torn
+        member of a crashed write only loses its own records).
+        params:
+            - records: list of dictionaries.
+        Output: number of records appended.
+        '''
+        if len(records) == 0:
+            return(0)
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, exist_ok=True)
+        if self.current is None or self.current_records >= self.segment_records:
+            self.roll()
+
+        text = ''.join(json.dumps(record, default=to_native) + '\n' for record in records)
+        with open(self.current, 'ab') as f:
+            f.write(gzip.compress(text.encode('utf-8')))
+            f.flush()
+            os.fsync(f.fileno())
+        self.current_records += len(records)
+
+        #Periodic compaction into the snapshot:
+        if len(self.segments()) >= self.compact_segments:
+            self.compact()
+
+        return(len(records))
+
+    def read(self, path):
+        '''
+        Function to read the records of a segment or snapshot, up to a torn write.
+        params:
+            - path: file path.
+        Output: generator of records (dictionaries).
+        '''
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        return
+                    yield record
+        except (OSError, EOFError, zlib.error):
+            return
+
+    def iter_records(self, chunk_size = 10000):
+        '''
+        Function to read the log, snapshot first and then the segments in writing order.
+        params:
+            - chunk_size: number of records on each chunk.
+        Output: generator of lists of records (dictionaries), chunk_size records at most.
+        '''
+        paths = [self.snapshot] if os.path.isfile(self.snapshot) else []
+        chunk = []
+        for path in paths + self.segments():
+            for record in self.read(path):
+                chunk.append(record)
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def compact(self):
+        '''
+        Function to compact the snapshot and the segments into a new snapshot, with the
+        last record of each user. The segments are removed once the snapshot is in place.
+        Output: number of records on the snapshot.
+        '''
+        segments = self.segments()
+        self.roll()
+
+        records = {}
+        for chunk in self.iter_records():
+            for record in chunk:
+                records[record.get(self.key)] = record
+
+        tmp_path = self.snapshot + '.' + str(os.getpid()) + '.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for record in records.values():
+                f.write(json.dumps(record) + '\n')
+        os.replace(tmp_path, self.snapshot)
+
+        for path in segments:
+            os.remove(path)
+
+        return(len(records))
+
+    def restore(self, out_path):
+        '''
+        Function to restore the log into a JSON lines file, with the last record of each user.
+        params:
+            - out_path: output file path.
+        Output: number of records restored.
+        '''
+        records = {}
+        for chunk in self.iter_records():
+            for record in chunk:
+                records[record.get(self.key)] = record
+
+        with open(out_path, 'w', encoding='utf-8') as f:
+            for record in records.values():
+                f.write(json.dumps(record) + '\n')
+
+        return(len(records))
+
+
+if __name__ == '__main__':
+
+    # Usage: python users_log.py compact <log_path>
+    #        python users_log.py restore <log_path> <out_path>
+    if len(sys.argv) < 3 or sys.argv[1] not in ('compact', 'restore') or (sys.argv[1] == 'restore' and len(sys.argv) < 4):
+        sys.exit('Usage: users_log.py compact <log_path> | restore <log_path> <out_path>')
+
+    users_log = UsersLog(sys.argv[2])
+    if sys.argv[1] == 'compact':
+        print('Users log compacted: ' + str(users_log.compact()) + ' users.')
+    else:
+        print('Users log restored: ' + str(users_log.restore(sys.argv[3])) + ' users.')
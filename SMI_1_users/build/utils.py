@@ -1,9 +1,10 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime as dt
-from tweepy import Cursor
+from tweepy import Cursor, NotFound
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 from psycopg2.extensions import register_adapter, AsIs
 
 register_adapter(np.int64, AsIs)
@@ -12,6 +13,9 @@ register_adapter(np.bool_, AsIs)
 import warnings
 warnings.filterwarnings("ignore")
 
+from users_log import UsersLog
+from known_users import KnownUsers
+
 class UsersPipeline:
     '''
     Generate new users in the users table of the database:
@@ -22,7 +26,11 @@ class UsersPipeline:
                 schema,
                 api,
                 temp_data_path,
-                api_logger
+                api_logger,
+                lookup_lease = 60,
+                users_log = None,
+                ff_mode = 'users',
+                known_users = None
                 ):
         #Local parameters
         self.queries_path = queries_path
@@ -32,6 +40,10 @@ class UsersPipeline:
         self.api = api
         self.temp_data_path = temp_data_path
         self.api_logger = api_logger
+        self.lookup_lease = lookup_lease
+        self.users_log = users_log or UsersLog(temp_data_path + 'get_users/users_log/')
+        self.ff_mode = ff_mode
+        self.known_users = known_users if known_users is not None else KnownUsers()
 
     ## DATABASE QUERY FUNCTIONS:
 
@@ -61,77 +73,77 @@ class UsersPipeline:
             self.api_logger.exception(error)
         cur.close()
 
-    ## TEXT TREATMENT FUNCTIONS:
-
-    def text_clean_loc(self, name):
-        '''
-        Function to remove accents from an alphanumeric string:
+    def pop_users(self, nusers):
+        """
+        Function to pop the best due users of the crawl frontier on DB: the users are
+        taken by next lookup (moved ahead by their priority) and leased until their
+        lookup is updated.
         params:
-            - name: character string.
-        Output: string without accents.
-        '''
+            - nusers: number of users to pop.
+        Output: list of popped users screen names.
+        """
         try:
-            #Define replacements (possible accents or other special char)
-            replacements = (
-                ("á", "a"),
-                ("é", "e"),
-                ("í", "i"),
-                ("ó", "o"),
-                ("ú", "u"),
-                ("ñ", 'n'),
-            )
-            #Replace with tuple:
-            for a, b in replacements:
-                name = name.replace(a, b).replace(a.upper(), b.upper())
-            return(name)
-        except Exception as error:
+            with open(self.queries_path + 'SMI_pop_users.sql') as f:
+                self.cur.execute(
+                    sql.SQL(f.read()).format(schema=sql.Identifier(self.schema)),
+                    {'nusers': nusers, 'lease': self.lookup_lease}
+                )
+                users = [row[0] for row in self.cur.fetchall()]
+                self.conn.commit()
+            return(users)
+
+        except (Exception, psycopg2.DatabaseError) as error:
+            self.conn.rollback()
             self.api_logger.exception(error)
+            return([])
 
-    def clean_loc(self, loc, munlist):
-        '''
-        Function to flag if the location, after being cleaned, still exist
+    def warm_known_users(self, batch_size = 100000):
+        """
+        Function to load the ids of the users on DB into the known users filter, streaming
+        them by batches with a server side cursor.
         params:
-            - loc: location.
-            - munlist: list of municipalities locations.
-        Output: flag which indicates whether the location exists.
-        '''
+            - batch_size: rows fetched on each round trip.
+        Output: number of known users.
+        """
         try:
-            
-            #Adapt text format to location column:
-            loc = self.text_clean_loc(loc.lower().replace(',', ''))
+            with open(self.queries_path + 'SMI_query_known_users.sql') as f:
+                query = sql.SQL(f.read()).format(schema=sql.Identifier(self.schema))
 
-            #Return dicotomic flag if user location is on munlist:
-            if loc in munlist:
-                return 1
-            else:
-                return 0
-        except Exception as error:
+            cur = self.conn.cursor(name='smi_known_users', withhold=True)
+            cur.itersize = batch_size
+            cur.execute(query)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                self.known_users.add_many(row[0] for row in rows)
+            cur.close()
+
+            self.api_logger.info('Database job: Known users loaded: ' + str(len(self.known_users)))
+            return(len(self.known_users))
+
+        except (Exception, psycopg2.DatabaseError) as error:
+            self.conn.rollback()
             self.api_logger.exception(error)
+            return(0)
+
+    ## TEXT TREATMENT FUNCTIONS:
 
     def treat_new_users(self, df, db_munlist):
         '''
         Function to treat the location column and filter non spanish users:
         params:
             - df: Dataframe with the new users.
-            - db_munist: list of spanish municipalities to filter the new users.
+            - db_munist: spanish municipalities matcher (LocationMatcher) to filter the new users.
         Output: Dataframe with only spanish users.
         '''
         try:
-            # Split the location column into a list of strings to check if each word is in the list:
-            df_t = df.copy()
-            df_t['smi_str_location'] = df_t['smi_str_location'].apply(lambda r: r.split())
-
-            # Clean the text of the location column:
-            locls = df_t['smi_str_location'].to_list()
-            locls_clean = [[self.clean_loc(loc, db_munlist) for loc in userloc] for userloc in locls]
-            
-            # Filter whether the users are in the municipalities or not:
-            df_t = pd.concat([df_t, pd.DataFrame([sum(userloc) for userloc in locls_clean]).rename(columns={0:'loc_filter'})], axis=1).reset_index(drop=True)
-            df_t = df_t[df_t['loc_filter']>0]
-            df_t.drop(columns='loc_filter', inplace=True)
+            # Match the location column with the municipalities (whole location or a sequence of its words),
+            # each distinct location is matched once:
+            munids = db_munlist.match_many(df['smi_str_location'])
             
-            # Inner join to keep only the spanish users from the original dataframe:
-            output = df.merge(df_t['smi_str_userid'], on='smi_str_userid', how='inner')
+            # Keep only the spanish users from the original dataframe:
+            output = df[[munid is not None for munid in munids]].reset_index(drop=True)
             output = output.astype({"smi_str_userid": str})
             output['smi_str_lastlookup'] = ''
             
@@ -253,58 +265,137 @@ class UsersPipeline:
             output = pd.DataFrame()
             pass
 
-    def update_user_lookup(self, user):
+    def get_ff_ids(self, user, api, page_size = 5000, lookup_size = 100):
         '''
-        Function to update the lookup status of a given user via query.
+        Function to get friends and followers from a given user by ids first: the ids
+        already known are skipped and only the unseen ones are looked up.
+        params:
+            - user: twitter user screen name.
+            - page_size: ids on each page of the ids API methods.
+            - lookup_size: users on each lookup API call.
+        Output: 
+            - dataframe with the unseen friends and followers of a given twitter user.
+            - number of friends and followers ids retrieved.
+        '''
+        ids = []
+        for relation, method in [('followers', api.get_follower_ids), ('friends', api.get_friend_ids)]:
+            try:
+                #Retrieve ids from a given user:
+                self.api_logger.info('Twitter API job: Retrieving ' + relation + ' ids')
+                n_ids = len(ids)
+                for page in Cursor(method, screen_name=user, count=page_size).pages():
+                    ids.extend(page)
+                self.api_logger.info('Twitter API job: Number of ' + relation + ' ids retrieved: ' + str(len(ids) - n_ids))
+
+            except Exception:
+                self.api_logger.info('Raised exception. ' + relation.capitalize() + ' ids retrieval failed.')
+                pass
+
+        #Skip the ids already seen:
+        unseen = self.known_users.unseen(ids)
+        self.api_logger.info('Twitter API job: Number of unseen ids to look up: ' + str(len(unseen)))
+
+        #Look up the unseen users by batches:
+        users = []
+        for i in range(0, len(unseen), lookup_size):
+            batch = unseen[i:i + lookup_size]
+            try:
+                users.extend(api.lookup_users(user_id=batch))
+            except NotFound:
+                #None of the users of the batch exist (suspended or deleted):
+                pass
+            except Exception:
+                #The ids of a failed batch stay unseen, to be looked up again:
+                self.api_logger.info('Raised exception. Users lookup failed.')
+                continue
+
+            #The looked up ids are not looked up again (spanish or not, or not found):
+            self.known_users.add_many(batch)
+
+        try:
+            output = self.ff_transform(users)
+            output.drop_duplicates(subset=['smi_str_userid'], inplace=True)
+            self.api_logger.info('Twitter API job: Number of users to be inserted into DB: ' + str(output.shape[0]))
+            output = output.astype({"smi_str_userid": object})
+            return(output.reset_index(drop=True), len(set(ids)))
+
+        except Exception:
+            self.api_logger.info('Raised exception, getting info from next user')
+            return(pd.DataFrame(), len(set(ids)))
+
+    def retrieve_ff(self, user, api):
+        '''
+        Function to get friends and followers from a given user, as full users ('users' mode)
+        or by ids first ('ids' mode).
+        params:
+            - user: twitter user screen name.
+        Output: 
+            - dataframe with the friends and followers of a given twitter user.
+            - number of friends and followers retrieved.
+        '''
+        if self.ff_mode == 'ids':
+            return(self.get_ff_ids(user, api))
+
+        output = self.get_ff(user, api)
+        if output is None:
+            output = pd.DataFrame()
+        return(output, output.shape[0])
+
+    def update_user_lookup(self, user, priority = 0.0):
+        '''
+        Function to update the lookup status of a given user via query, rescheduling it
+        on the crawl frontier.
         params:
             - user: screenName of a user.
+            - priority: share of its friends and followers that were new spanish users.
         '''
         try:
             self.api_logger.info('Database job: Updating lookup of user')
             with open(self.queries_path + 'SMI_update_lookup_users.sql') as f:
                 self.cur.execute(
                     sql.SQL(f.read()).format(schema=sql.Identifier(self.schema)),
-                    (user, )
+                    {'user': user, 'priority': priority}
                 )
                 self.conn.commit()
         except (Exception, psycopg2.DatabaseError) as error:
             self.conn.rollback()
             self.api_logger.exception(error)
 
-    def insert_new_users_into_db(self, path, user_row):
+    def insert_new_users(self, df, priority):
         '''
-        Function to check if a new user exists and insert into db in other case.
+        Function to insert the new users found through a user, with their date tweets rows,
+        in one statement (the users already on DB are skipped by the primary keys).
         params:
-            - user_row: row to insert into the db.
+            - df: dataframe with the new users, named as the users table columns.
+            - priority: crawl frontier priority inherited by the new users.
+        Output: list of the screen names inserted into the users table.
         '''
-
         try:
-            with open(path) as f:
-                self.cur.execute(
-                    sql.SQL(f.read()).format(schema=sql.Identifier(self.schema)),
-                    user_row
-                )
+            rows = [tuple(row) + (priority, ) for row in df.itertuples(index=False)]
+            if len(rows) == 0:
+                return([])
+
+            with open(self.queries_path + 'SMI_insert_new_users.sql') as f:
+                query = sql.SQL(f.read()).format(schema=sql.Identifier(self.schema)).as_string(self.cur)
+
+            #One page, so the batch is a single statement:
+            result = execute_values(self.cur, query, rows, page_size=len(rows), fetch=True)
+            self.conn.commit()
+            return([row[0] for row in result])
 
-                self.conn.commit()
         except (Exception, psycopg2.DatabaseError) as error:
             self.conn.rollback()
             self.api_logger.exception(error)
+            return([])
     
     def users_backup(self, df):
         '''
-        Function to backup users.
+        Function to backup the new users, appending them to the users change log.
         params:
-            - df: dataframe of users.
+            - df: dataframe of the new users.
         '''
         try:
-
-            (df.to_json(self.temp_data_path + 
-            'get_users/db_users_' + 
-            str(dt.today().strftime("%Y-%m-%d")) + 
-            '.json', 
-            orient='records', 
-            date_format='iso')
-            )
+            self.users_log.append(df.to_dict('records'))
             
         except Exception as error:
             self.api_logger.exception(error)
@@ -319,48 +410,40 @@ class UsersPipeline:
         try:
             
             #Get friends and followers from a given user:
-            df_new_users = self.get_ff(user, api)
+            df_new_users, n_retrieved = self.retrieve_ff(user, api)
+            priority = 0.0
             #Insert new users into database and drop duplicates:
             if df_new_users.shape[0] > 0:
 
+                #Priority from the yield of spanish users of the neighbourhood:
+                n_looked_up = df_new_users.shape[0]
                 df_new_users = self.treat_new_users(df_new_users, munlist)
+                priority = df_new_users.shape[0] / n_looked_up
 
                 self.api_logger.info('Database job: Number of new users to be inserted into DB: ' + str(df_new_users.shape[0]))
                 self.api_logger.info('Database job: Insert new users into DB')
 
-                # Set queries paths: 
-                path_users_table = self.queries_path + 'SMI_insert_new_user.sql'
-                path_date_tweets_table = self.queries_path + 'SMI_insert_new_datetweets.sql'
-
-                # Copy data frame and create datetweets column:
-                df_dt = df_new_users.copy()
-                df_dt['smi_str_datetweets'] = ''
+                #Insert the new users and their date tweets rows in one statement:
+                df_new_users = df_new_users.drop_duplicates(subset=['smi_str_username'])
+                inserted = self.insert_new_users(df_new_users, priority)
+                if self.ff_mode == 'ids':
+                    self.known_users.add_many(df_new_users['smi_str_userid'])
 
-                for i in range(df_new_users.shape[0]):
-                    self.insert_new_users_into_db(path_users_table, tuple(df_new_users.iloc[i, :]))
-                    self.insert_new_users_into_db(path_date_tweets_table, tuple(df_dt[['smi_str_username', 'smi_str_datetweets']].iloc[i, :]))
+                #The user is rescheduled by the yield of accounts new to DB:
+                priority = len(inserted) / n_retrieved
 
-                self.api_logger.info('Database job: New users inserted into DB')
+                self.api_logger.info('Database job: New users inserted into DB: ' + str(len(inserted)))
                 self.api_logger.info('Data job: Saving new users backup' )
 
-                df = pd.DataFrame(self.fetchall_SQL(self.queries_path + 'SMI_query_all_users.sql'))
-                df.columns = ['smi_str_userid', 
-                                'smi_str_username', 
-                                'smi_int_followers', 
-                                'smi_int_friends', 
-                                'smi_bool_protected', 
-                                'smi_str_location', 
-                                'smi_str_lang', 
-                                'smi_str_lastlookup']
-
-                self.users_backup(df)
+                #Only the inserted users are appended to the users change log:
+                self.users_backup(df_new_users[df_new_users['smi_str_username'].isin(inserted)])
                 self.api_logger.info('Data job: New users backup saved')
 
             else:
                 self.api_logger.info('Database job: There are not new users to be inserted into DB')
 
             #Update ff_lookup column from a given user in database:
-            self.update_user_lookup(user)
+            self.update_user_lookup(user, priority)
 
         except Exception as error:
             self.api_logger.exception(error)
\ No newline at end of file
@@ -1,17 +1,23 @@
+from startup import StartupReport
+startup = StartupReport()
+
 import pandas as pd
-import random
+startup.mark('Import pandas')
 import os
 import json
 import time
+import queue
+import socket
 import logging
 from datetime import datetime as dt
-import spacy
-nlp = spacy.load('es_core_news_sm')
+from concurrent.futures import ThreadPoolExecutor
+startup.mark('Import standard library')
 
 import warnings
 warnings.filterwarnings('ignore')
 
 from utils import *
+startup.mark('Import utils (snscrape, psycopg2, cleaning)')
 
 # APP Params:
 
@@ -23,6 +29,38 @@ logs_path = app_config['logs_path']
 temp_data_path = app_config['temp_data_path']
 app_name = app_config['app_name']
 
+# Scrap jobs queue:
+lease_seconds = app_config.get('lease_seconds', 1800)
+jobs_refill = app_config.get('jobs_refill', 100)
+max_attempts = app_config.get('max_attempts', 3)
+max_window_days = app_config.get('max_window_days', 30)
+max_window_tweets = app_config.get('max_window_tweets', 500)
+worker = socket.gethostname() + '-' + str(os.getpid())
+
+# Requests rate controller, the interval (seconds) paces each results page of page_size tweets:
+page_size = app_config.get('page_size', 20)
+rate_floor = app_config.get('rate_floor', 2)
+rate_ceiling = app_config.get('rate_ceiling', 120)
+rate_initial = app_config.get('rate_initial', 25)
+rate_jitter = app_config.get('rate_jitter', 0.2)
+idle_sleep = app_config.get('idle_sleep', 60)
+
+# Concurrent fetches in flight, rows per scraped batch and rows written per COPY:
+concurrency = app_config.get('concurrency', 1)
+batch_rows = app_config.get('batch_rows', 500)
+copy_batch = app_config.get('copy_batch', 5000)
+
+# Filtering words matching ('substring' or 'token'):
+ecofilter_mode = app_config.get('ecofilter_mode', 'substring')
+
+# Lemmatization of the cleaned texts (off by default), with a token -> lemma cache on disk:
+lemmatize = app_config.get('lemmatize', False)
+lemma_cache_size = app_config.get('lemma_cache_size', 200000)
+lemma_batch_size = app_config.get('lemma_batch_size', 1000)
+lemma_processes = app_config.get('lemma_processes', 1)
+
+startup.mark('Load config')
+
 # Check and create directories:
 if not os.path.isdir(logs_path):
     os.makedirs(logs_path)
@@ -44,6 +82,7 @@ logging.basicConfig(
         logging.FileHandler(os.path.join(logs_path, app_name, file_name)),
         logging.StreamHandler()
     ])
+startup.mark('Logger initialization')
 
 try:
 
@@ -66,85 +105,141 @@ try:
     conn.autocommit = True
     cur = conn.cursor()
     schema = db_config['db_schema']
+    startup.mark('Database connection')
 
-    # Users pipeline class instance:
-    tpipe = TweetsPipeline(queries_path, conn, schema, api_logger)
+    # Users pipeline class instance, sharing the requests rate controller:
+    rate = RateController(floor=rate_floor, ceiling=rate_ceiling, initial=rate_initial, jitter=rate_jitter)
+    lemmatizer = None
+    if lemmatize:
+        lemmatizer = Lemmatizer(cache_path=temp_data_path + 'utils/lemma_cache.pkl', cache_size=lemma_cache_size, 
+                                batch_size=lemma_batch_size, n_process=lemma_processes)
+    tpipe = TweetsPipeline(queries_path, conn, schema, api_logger, rate, ecofilter_mode, lemmatizer)
 
     api_logger.info('Data jobs: Load auxiliar data from files.')
 
-    ##Load stopwords:
+    ##Load stopwords and ecolist (compiled lexicons artifact):
     stops = ['/db_stopwords_spanish_1.txt', '/db_stopwords_spanish_2.txt']
-    stopw = tpipe.get_stops(temp_data_path + 'utils', stops)
-    ##Load ecolist:
     files = ['/ecofilter.xlsx']
-    ecolist = tpipe.get_ecofilter(temp_data_path + 'utils', files)
+    stopw, ecolist = tpipe.get_lexicons(temp_data_path + 'utils', stops, files)
+    startup.mark('Load stopwords and ecofilter')
 
 except (Exception, psycopg2.DatabaseError) as error:
     logging.exception(error)
 
+startup.report(api_logger)
+
 # Process initialization:
 
-while True:
+def fetch_job(job):
+    '''
+    Function to scrap the tweets of a job (user, days window) and stream them to the
+    writer by batches: (job, dataframe) for each batch, then (job, None) when the window
+    is done or (job, error) if the scrapping failed.
+    '''
+    job_id, user_screename, ini_date, end_date = job
     try:
+        for df_tweets in tpipe.iter_tweets(user_screename, ini_date, end_date, stopw, ecolist, max_window_tweets, batch_rows, page_size):
+            batches.put((job, df_tweets))
+        batches.put((job, None))
+    except Exception as error:
+        batches.put((job, error))
+
+executor = ThreadPoolExecutor(max_workers=concurrency)
+batches = queue.Queue(maxsize=2 * concurrency)
+running = {}
+buffer = []
+finished = []
+failed = []
+buffered = set()
+lost = set()
+n_rows = 0
+renewed = time.monotonic()
 
-        ## Select user randomly from date tweets table (SQL query) "user":
-        api_logger.info('Database job: Select user randomly from DB.')
-        user = tpipe.fetchall_SQL(queries_path + 'SMI_get_random_user.sql')[0]
-
-        ## Remove comma on the head of the vectorized version of the column "smi_str_datetweets" of the user and call it "user_date_tweets"
-        ## Create object with username called user_screename:
-        user = list(user)
-        if len(user[1]) > 0:
-            if user[1].split()[0] == ',':
-                user[1] = ', '.join(user[1].split(', ')[1:])
-
-        user_screename = user[0]
-        user_date_tweets = user[1]
-
-        ## Create vector of dates [2012-01-01, today] called "all_dates":
-        all_dates = [str(date.date()) for date in pd.date_range('2012-01-01', pd.to_datetime("today"), freq='D')]
-
-        ## Create vector of disjoint dates between "all_dates" and "user_date_tweets" and call it "dates_to_scrap":
-        dates_to_scrap = list(set(all_dates) - set(user_date_tweets))
-
-        ## Select randomly one of "dates_to_scrap":
-        ini_date = random.choice(dates_to_scrap)
-
-        ## Create end_date as initial_date + 1 day:
-        end_date = (pd.to_datetime(ini_date) + pd.DateOffset(days=1)).date().strftime('%Y-%m-%d')
-
-        ## Scrap the tweets of the user on that dates range:
-        api_logger.info('Scrapping job: Retrieving tweets from user.')
-        df_tweets = tpipe.get_tweets(user_screename, ini_date, end_date, stopw, ecolist)
-        api_logger.info('Scrapping job: Number of tweets: ' + str(df_tweets.shape[0]))
-        
-        if df_tweets.shape[0] > 0:
-
-            ## Insert the tweets in the tweets table (df_to_postgres) if there are tweets, otherwise do nothing
-            api_logger.info('Database job: Inserting tweets on DB.')
-            tpipe.df_to_postgres(df_tweets, 'smi_tweets')
-            api_logger.info('Database job: Tweets inserted on DB.')
-
-            ## Execute SQL query to remove duplicated entries on the tweets table:
-            #api_logger.info('Database job: Removing duplicated entries.')
-            #tpipe.query_SQL(queries_path + 'SMI_remove_dup_tweets.sql')
-            #api_logger.info('Database job: Duplicated entries removed.')
-
-        else:
+while True:
+    idle = False
+    try:
 
-            api_logger.info('Database job: There are no tweets to insert on DB.')
+        ## Claim jobs (user, days window) from the scrap jobs queue while there are free fetchers:
+        while len(running) < concurrency:
+            api_logger.info('Database job: Claim scrap job from DB.')
+            job = tpipe.claim_job(worker, lease_seconds)
+
+            ## If the queue is empty, enqueue one random window of contiguous days not scraped yet of a sample of users:
+            if job is None:
+                api_logger.info('Database job: Scrap jobs queue empty, enqueuing jobs.')
+                n_jobs = tpipe.enqueue_jobs(jobs_refill, max_window_days)
+                api_logger.info('Database job: Number of jobs enqueued: ' + str(n_jobs))
+                job = tpipe.claim_job(worker, lease_seconds)
+
+            if job is None:
+                api_logger.info('Database job: There are no jobs to claim.')
+                idle = True
+                break
+
+            ## Scrap the tweets of the user on that dates range (split while it returns too many tweets),
+            ## all the fetchers share the requests rate controller:
+            api_logger.info('Scrapping job: Retrieving tweets from user ' + job[1] + ' from ' + job[2] + ' to ' + job[3] + '.')
+            executor.submit(fetch_job, job)
+            running[job[0]] = job
+
+        ## Collect the scraped batches until there are copy_batch rows to write:
+        try:
+            item = batches.get(timeout=lease_seconds / 4) if running else None
+            while item is not None:
+                job, result = item
+                if isinstance(result, pd.DataFrame):
+                    buffer.append(result)
+                    buffered.add(job[0])
+                    n_rows += result.shape[0]
+                else:
+                    ## Window done, its job is reported once its tweets are written; the failed jobs go back to the queue:
+                    running.pop(job[0])
+                    if result is None and job[0] not in lost:
+                        finished.append(job)
+                    else:
+                        if result is not None:
+                            logging.error(result, exc_info=result)
+                        failed.append(job)
+                if n_rows >= copy_batch:
+                    break
+                item = batches.get_nowait()
+        except queue.Empty:
+            pass
+
+        ## Write the buffered batches with one COPY when it is full, enough jobs are done or there is nothing else running,
+        ## then mark the dates of the finished jobs as scraped on smi_date_coverage table on DB and report them done:
+        if (buffer or finished) and (n_rows >= copy_batch or len(finished) >= concurrency or not running):
+            api_logger.info('Database job: Inserting ' + str(n_rows) + ' tweets on DB.')
+            n_tweets = tpipe.write_jobs(buffer, finished, worker)
+            if n_tweets is None:
+                ## The tweets of the running jobs with batches on the buffer were lost, retry them later:
+                lost.update([job_id for job_id in buffered if job_id in running])
+                failed.extend(finished)
+            else:
+                api_logger.info('Database job: Tweets inserted on DB, jobs done: ' + str(len(finished)))
+            buffer, finished, n_rows = [], [], 0
+            buffered = set()
+
+        for job in failed:
+            lost.discard(job[0])
+            tpipe.fail_job(job[0], worker, max_attempts)
+        failed = []
+
+        ## Extend the lease of the jobs still held by this worker:
+        if time.monotonic() - renewed > lease_seconds / 2:
+            for job in list(running.values()) + finished:
+                tpipe.renew_job(job[0], worker, lease_seconds)
+            renewed = time.monotonic()
 
-        ## Update new retrieval date on smi_date_tweets table on DB
-        api_logger.info('Database job: Inserting date tweets into DB.')
-        user_to_insert = user.copy()
-        user_to_insert[1] = ', '.join(user_to_insert[1].split(', ') + [ini_date])
-        tpipe.insert_datetweets_into_db(queries_path + 'SMI_insert_date_tweets.sql', tuple(user_to_insert))
-        api_logger.info('Database job: Date tweets inserted into DB.')
+    except Exception as error:
+        logging.exception(error)
+        idle = True
 
-        ## SLEEP n seconds, choose n randomly:
-        sleep_time = random.randint(20, 30)
-        api_logger.info('Sleeping system for: ' + str(sleep_time) + ' seconds.')
-        time.sleep(sleep_time)
+    ## Export the current requests rate, the pace between requests is set by the rate controller:
+    state = rate.export(os.path.join(logs_path, app_name, 'rate_status.json'))
+    api_logger.info('Rate controller: Interval ' + str(state['interval']) + ' seconds (' + str(state['rate_per_hour']) + ' requests per hour).')
 
-    except Exception as error:
-        logging.exception(error)
\ No newline at end of file
+    ## SLEEP when there is no work to do:
+    if idle and not running:
+        api_logger.info('Sleeping system for: ' + str(idle_sleep) + ' seconds.')
+        time.sleep(idle_sleep)
@@ -0,0 +1,29 @@
+-- Claim the oldest pending job (or a running job with an expired lease), skipping the jobs locked by other workers:
+
+UPDATE 
+    {schema}.smi_scrap_jobs sj
+SET 
+    "smi_str_status" = 'running',
+    "smi_str_worker" = %(worker)s,
+    "smi_ts_lease" = NOW() + %(lease)s * INTERVAL '1 SECOND',
+    "smi_int_attempts" = sj."smi_int_attempts" + 1,
+    "smi_ts_updated" = NOW()
+WHERE 
+    sj."smi_int_jobid" = (
+        SELECT 
+            j."smi_int_jobid"
+        FROM 
+            {schema}.smi_scrap_jobs j
+        WHERE 
+            j."smi_str_status" = 'pending'
+            OR (j."smi_str_status" = 'running' AND j."smi_ts_lease" < NOW())
+        ORDER BY 
+            j."smi_int_jobid"
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+RETURNING 
+    sj."smi_int_jobid", 
+    sj."smi_str_username", 
+    TO_CHAR(sj."smi_dt_ini", 'YYYY-MM-DD'), 
+    TO_CHAR(sj."smi_dt_end", 'YYYY-MM-DD');
@@ -0,0 +1,11 @@
+-- Report a job as done by the worker holding its lease:
+
+UPDATE 
+    {schema}.smi_scrap_jobs sj
+SET 
+    "smi_str_status" = 'done',
+    "smi_ts_lease" = NULL,
+    "smi_ts_updated" = NOW()
+WHERE 
+    sj."smi_int_jobid" = %(jobid)s
+    AND sj."smi_str_worker" = %(worker)s;
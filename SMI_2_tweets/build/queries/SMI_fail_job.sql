@@ -0,0 +1,11 @@
+-- Report a job as failed by the worker holding its lease, back to pending while it has attempts left:
+
+UPDATE 
+    {schema}.smi_scrap_jobs sj
+SET 
+    "smi_str_status" = CASE WHEN sj."smi_int_attempts" >= %(max_attempts)s THEN 'failed' ELSE 'pending' END,
+    "smi_ts_lease" = NULL,
+    "smi_ts_updated" = NOW()
+WHERE 
+    sj."smi_int_jobid" = %(jobid)s
+    AND sj."smi_str_worker" = %(worker)s;
@@ -0,0 +1,36 @@
+-- Sample of users without an active job, with their coverage bitmap: keyset scan from a
+-- random pivot on the hashed usernames (index smi_date_tweets_sample_idx), wrapping
+-- around the index end:
+
+SELECT 
+    sdt."smi_str_username", 
+    COALESCE(cov."smi_bit_days"::text, '') 
+FROM (
+    (SELECT sd."smi_str_username"
+    FROM {schema}.smi_date_tweets sd
+    WHERE md5(sd."smi_str_username") >= %(pivot)s
+    AND NOT EXISTS (
+        SELECT 1 
+        FROM {schema}.smi_scrap_jobs sj
+        WHERE sj."smi_str_username" = sd."smi_str_username"
+        AND sj."smi_str_status" IN ('pending', 'running')
+    )
+    ORDER BY md5(sd."smi_str_username")
+    LIMIT %(n_users)s)
+    UNION ALL
+    (SELECT sd."smi_str_username"
+    FROM {schema}.smi_date_tweets sd
+    WHERE md5(sd."smi_str_username") < %(pivot)s
+    AND NOT EXISTS (
+        SELECT 1 
+        FROM {schema}.smi_scrap_jobs sj
+        WHERE sj."smi_str_username" = sd."smi_str_username"
+        AND sj."smi_str_status" IN ('pending', 'running')
+    )
+    ORDER BY md5(sd."smi_str_username")
+    LIMIT %(n_users)s)
+    LIMIT %(n_users)s
+) sdt
+LEFT JOIN 
+    {schema}.smi_date_coverage cov
+    ON cov."smi_str_username" = sdt."smi_str_username";
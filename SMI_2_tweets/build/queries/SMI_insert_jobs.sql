@@ -0,0 +1,11 @@
+-- Enqueue new jobs, skipping users which already have an active job:
+
+INSERT INTO 
+    {schema}.smi_scrap_jobs 
+        ("smi_str_username", 
+        "smi_dt_ini", 
+        "smi_dt_end")
+VALUES 
+    %s
+ON CONFLICT 
+DO NOTHING;
@@ -0,0 +1,17 @@
+-- Insert the staged tweets into the tweets table, skipping the tweets already on DB:
+
+INSERT INTO {schema}.smi_tweets ("smi_str_username", 
+                                 "smi_ts_date",
+                                 "smi_str_tweet",
+                                 "smi_str_tweetkey",
+                                 "smi_str_ecoterms")
+SELECT 
+    stg."smi_str_username", 
+    stg."smi_ts_date",
+    stg."smi_str_tweet",
+    stg."smi_str_tweetkey",
+    stg."smi_str_ecoterms"
+FROM 
+    {staging} stg
+ON CONFLICT ("smi_str_tweetkey")
+DO NOTHING;
@@ -0,0 +1,7 @@
+-- Drop the jobs done more than one day ago:
+
+DELETE FROM 
+    {schema}.smi_scrap_jobs sj
+WHERE 
+    sj."smi_str_status" = 'done'
+    AND sj."smi_ts_updated" < NOW() - INTERVAL '1 DAY';
@@ -0,0 +1,11 @@
+-- Extend the lease of a running job held by the worker:
+
+UPDATE 
+    {schema}.smi_scrap_jobs sj
+SET 
+    "smi_ts_lease" = NOW() + %(lease)s * INTERVAL '1 SECOND',
+    "smi_ts_updated" = NOW()
+WHERE 
+    sj."smi_int_jobid" = %(jobid)s
+    AND sj."smi_str_worker" = %(worker)s
+    AND sj."smi_str_status" = 'running';
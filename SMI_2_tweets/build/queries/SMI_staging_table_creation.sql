@@ -0,0 +1,6 @@
+-- Create (once per session) a temporary staging table shaped as the target table:
+
+CREATE TEMP TABLE IF NOT EXISTS {staging} 
+    (LIKE {schema}.{table} INCLUDING DEFAULTS);
+
+TRUNCATE {staging};
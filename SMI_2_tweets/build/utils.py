@@ -2,15 +2,132 @@ from io import StringIO
 import snscrape.modules.twitter as sntwitter
 import pandas as pd
 import re
+import time
+import json
+import random
+import hashlib
+import threading
+from datetime import datetime as dt
+from datetime import timedelta
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 
-import spacy
-nlp = spacy.load('es_core_news_sm')
+from cleaning import TweetCleaner, Lemmatizer, ACCENTS_TABLE, load_artifact, save_artifact
 
 import warnings
 warnings.filterwarnings('ignore')
 
+# First day of the scraped days coverage bitmaps:
+COVERAGE_START = '2012-01-01'
+
+
+class RateController:
+    '''
+    Adaptive interval between scrapper requests (AIMD): the interval decreases
+    additively after each fast success and increases multiplicatively after errors,
+    specially after throttling (HTTP 429), always bounded by floor and ceiling seconds.
+    It is thread safe, so several fetchers can share one requests budget.
+    '''
+    def __init__(self,
+                floor = 2.0,
+                ceiling = 120.0,
+                initial = 25.0,
+                step = 1.0,
+                backoff = 2.0,
+                throttle_backoff = 4.0,
+                jitter = 0.2,
+                slow_latency = 30.0
+                ):
+
+        #Local parameters
+        self.floor = floor
+        self.ceiling = ceiling
+        self.interval = min(max(initial, floor), ceiling)
+        self.step = step
+        self.backoff = backoff
+        self.throttle_backoff = throttle_backoff
+        self.jitter = jitter
+        self.slow_latency = slow_latency
+
+        #Counters
+        self.lock = threading.Lock()
+        self.next_time = time.monotonic()
+        self.successes = 0
+        self.failures = 0
+        self.throttled = 0
+
+    def acquire(self):
+        '''
+        Function to wait for the next request slot.
+        output: seconds waited.
+        '''
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_time)
+            self.next_time = slot + self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return(wait)
+
+    def success(self, latency = None):
+        '''
+        Function to report a successful request, slow requests don't shorten the interval.
+        params:
+            - latency: seconds taken by the request.
+        '''
+        with self.lock:
+            self.successes += 1
+            if latency is not None and latency > self.slow_latency:
+                self.interval = min(self.ceiling, self.interval + self.step)
+            else:
+                self.interval = max(self.floor, self.interval - self.step)
+
+    def failure(self, error = None):
+        '''
+        Function to report a failed request, throttling errors back off harder
+        and delay the next request slot.
+        params:
+            - error: exception or message of the failed request.
+        '''
+        message = str(error)
+        throttled = '429' in message or 'Too Many Requests' in message or 'rate limit' in message.lower()
+
+        with self.lock:
+            self.failures += 1
+            if throttled:
+                self.throttled += 1
+                self.interval = min(self.ceiling, self.interval * self.throttle_backoff)
+                self.next_time = max(self.next_time, time.monotonic() + self.interval)
+            else:
+                self.interval = min(self.ceiling, self.interval * self.backoff)
+
+    def status(self):
+        '''
+        Function to get the current state of the controller.
+        output: dict with the interval, rate (requests per hour) and counters.
+        '''
+        with self.lock:
+            return({'interval': round(self.interval, 3),
+                    'rate_per_hour': round(3600 / self.interval, 1),
+                    'successes': self.successes,
+                    'failures': self.failures,
+                    'throttled': self.throttled})
+
+    def export(self, path):
+        '''
+        Function to write the current state of the controller to a json file.
+        params:
+            - path: relative path to the file.
+        '''
+        state = self.status()
+        state['updated'] = dt.now().strftime('%Y-%m-%d %H:%M:%S')
+        with open(path, 'w') as f:
+            json.dump(state, f)
+        return(state)
+
 
 class TweetsPipeline:
     '''
@@ -20,7 +137,10 @@ class TweetsPipeline:
                 queries_path,
                 conn,
                 schema,
-                api_logger
+                api_logger,
+                rate = None,
+                ecofilter_mode = 'substring',
+                lemmatizer = None
                 ):
 
         #Local parameters
@@ -29,6 +149,10 @@ class TweetsPipeline:
         self.cur = conn.cursor()
         self.schema = schema
         self.api_logger = api_logger
+        self.rate = rate
+        self.ecofilter_mode = ecofilter_mode
+        self.lemmatizer = lemmatizer
+        self.cleaner = None
 
     ## DATABASE QUERY FUNCTIONS:
 
@@ -54,51 +178,257 @@ class TweetsPipeline:
             self.conn.rollback()
             self.api_logger.exception(error)
 
-    def insert_datetweets_into_db(self, path, user_row):
+    def run_SQL(self, path, params = None):
+        """
+        Function to execute a query with parameters on database:
+        params:
+            - path: relative path to the file.
+            - params: query parameters.
+        output: rows returned by the query (empty list if the query returns no rows).
+        """
+        try:
+            cur = self.conn.cursor()
+            with open(path, 'r') as f:
+                cur.execute(sql.SQL(f.read()).format(schema=sql.Identifier(self.schema)), params)
+            db_fetch = cur.fetchall() if cur.description is not None else []
+            self.conn.commit()
+            cur.close()
+            return(db_fetch)
+
+        except (Exception, psycopg2.DatabaseError) as error:
+            self.conn.rollback()
+            self.api_logger.exception(error)
+
+    def days_bitmap(self, dates):
+        '''
+        Function to encode a list of days as a coverage bitmap.
+        params:
+            - dates: list of days ('YYYY-MM-DD').
+        output: string of bits, bit i is '1' if the day COVERAGE_START + i is on the list.
+        '''
+        start = dt.strptime(COVERAGE_START, '%Y-%m-%d')
+        idx = [(dt.strptime(date, '%Y-%m-%d') - start).days for date in dates]
+        idx = [i for i in idx if i >= 0]
+        bits = ['0'] * (max(idx) + 1 if len(idx) > 0 else 0)
+        for i in idx:
+            bits[i] = '1'
+        return(''.join(bits))
+
+    def unscraped_days(self, bits, date_end = None):
         '''
-        Function to update tweet dates on DB.
+        Function to list the days not scraped yet from a coverage bitmap.
         params:
-            - user_row: row to insert into the db.
+            - bits: coverage bitmap of the user (string of bits).
+            - date_end: last day to consider, today by default.
+        output: list of days ('YYYY-MM-DD') from COVERAGE_START to date_end not scraped.
         '''
+        days = pd.date_range(COVERAGE_START, date_end or pd.to_datetime('today'), freq='D')
+        return([str(day.date()) for i, day in enumerate(days) if i >= len(bits) or bits[i] == '0'])
 
+    def mark_days_scraped(self, user, dates):
+        '''
+        Function to mark days of a user as scraped on the coverage table.
+        params:
+            - user: twitter user name.
+            - dates: list of days ('YYYY-MM-DD').
+        '''
         try:
             cur = self.conn.cursor()
-            with open(path) as f:
+            with open(self.queries_path + 'SMI_mark_coverage_days.sql') as f:
                 cur.execute(
                     sql.SQL(f.read()).format(schema=sql.Identifier(self.schema)),
-                    user_row
+                    {'username': user, 'days': self.days_bitmap(dates)}
                 )
+            self.conn.commit()
+            cur.close()
+        except (Exception, psycopg2.DatabaseError) as error:
+            self.conn.rollback()
+            self.api_logger.exception(error)
+
+    ## SCRAP JOBS QUEUE FUNCTIONS:
+
+    def window_days(self, date_ini, date_end):
+        '''
+        Function to list the days of a time window.
+        params:
+            - date_ini: first day of the window ('YYYY-MM-DD').
+            - date_end: day after the last day of the window ('YYYY-MM-DD').
+        output: list of days ('YYYY-MM-DD') from date_ini to date_end (not included).
+        '''
+        ini = dt.strptime(date_ini, '%Y-%m-%d')
+        n_days = (dt.strptime(date_end, '%Y-%m-%d') - ini).days
+        return([(ini + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(n_days)])
+
+    def plan_windows(self, days, max_span):
+        '''
+        Function to coalesce contiguous days into scrap windows.
+        params:
+            - days: list of days ('YYYY-MM-DD') to scrap, sorted.
+            - max_span: maximum number of days of a window.
+        output: list of windows (first day, day after the last day).
+        '''
+        windows = []
+        ini = end = None
+        for day in days:
+            day = dt.strptime(day, '%Y-%m-%d')
+            #Extend the current window with the next day if it is contiguous and fits:
+            if ini is not None and day == end and (end - ini).days < max_span:
+                end = day + timedelta(days=1)
+            else:
+                if ini is not None:
+                    windows.append((ini.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')))
+                ini, end = day, day + timedelta(days=1)
+        if ini is not None:
+            windows.append((ini.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')))
+        return(windows)
+
+    def enqueue_jobs(self, n_users, max_span = 1):
+        '''
+        Function to enqueue scrap jobs for a random sample of users without an active job
+        (read from a random pivot of the hashed usernames), one random window of
+        contiguous days not scraped yet for each user.
+        params:
+            - n_users: number of users to sample.
+            - max_span: maximum number of days of a window.
+        output: number of jobs enqueued.
+        '''
+        try:
+            self.run_SQL(self.queries_path + 'SMI_purge_jobs.sql')
+            pivot = '%032x' % random.getrandbits(128)
+            users = self.run_SQL(self.queries_path + 'SMI_get_users_to_enqueue.sql', {'n_users': n_users, 'pivot': pivot})
+
+            jobs = []
+            for user, bits in users:
+                windows = self.plan_windows(self.unscraped_days(bits), max_span)
+                if len(windows) > 0:
+                    ini_date, end_date = random.choice(windows)
+                    jobs.append((user, ini_date, end_date))
+            if len(jobs) == 0:
+                return(0)
+
+            cur = self.conn.cursor()
+            with open(self.queries_path + 'SMI_insert_jobs.sql', 'r') as f:
+                query = sql.SQL(f.read()).format(schema=sql.Identifier(self.schema)).as_string(cur)
+            #One statement for all the jobs, so the row count is the number of jobs enqueued:
+            execute_values(cur, query, jobs, page_size=len(jobs))
+            n_jobs = cur.rowcount
+            self.conn.commit()
+            cur.close()
+            return(n_jobs)
 
-                self.conn.commit()
         except (Exception, psycopg2.DatabaseError) as error:
             self.conn.rollback()
             self.api_logger.exception(error)
 
-    def df_to_postgres(self, df, table):
+    def claim_job(self, worker, lease):
+        '''
+        Function to claim the next scrap job of the queue (SKIP LOCKED, safe with parallel workers).
+        params:
+            - worker: worker identifier.
+            - lease: seconds the job is held before other workers can claim it again.
+        output: tuple (job id, user, first day, day after the last day) or None if the queue is empty.
+        '''
+        rows = self.run_SQL(self.queries_path + 'SMI_claim_job.sql', {'worker': worker, 'lease': lease})
+        return(rows[0] if rows else None)
+
+    def renew_job(self, job_id, worker, lease):
+        '''
+        Function to extend the lease of a running job.
+        params:
+            - job_id: job identifier.
+            - worker: worker identifier.
+            - lease: seconds from now the job is held.
+        '''
+        self.run_SQL(self.queries_path + 'SMI_renew_job_lease.sql', {'jobid': job_id, 'worker': worker, 'lease': lease})
+
+    def complete_job(self, job_id, worker):
+        '''
+        Function to report a job as done.
+        params:
+            - job_id: job identifier.
+            - worker: worker identifier.
+        '''
+        self.run_SQL(self.queries_path + 'SMI_complete_job.sql', {'jobid': job_id, 'worker': worker})
+
+    def fail_job(self, job_id, worker, max_attempts):
+        '''
+        Function to report a job as failed, it goes back to the queue while it has attempts left.
+        params:
+            - job_id: job identifier.
+            - worker: worker identifier.
+            - max_attempts: number of attempts before the job is discarded.
+        '''
+        self.run_SQL(self.queries_path + 'SMI_fail_job.sql', {'jobid': job_id, 'worker': worker, 'max_attempts': max_attempts})
+
+    def write_jobs(self, dfs, jobs, worker):
+        '''
+        Function to write batches of scraped tweets with one COPY, then mark the days of
+        the finished scrap jobs as scraped and report them done.
+        params:
+            - dfs: list of dataframes of tweets.
+            - jobs: list of finished jobs (job id, user, first day, day after the last day).
+            - worker: worker identifier.
+        output: number of tweets written or None if the tweets couldn't be written.
+        '''
+        dfs = [df for df in dfs if df.shape[0] > 0]
+        n_tweets = sum([df.shape[0] for df in dfs])
+
+        ## Tweets already on DB are skipped by their unique key:
+        if n_tweets > 0:
+            df = pd.concat(dfs, axis=0).reset_index(drop=True)
+            if not self.upsert_to_postgres(self.queries_path + 'SMI_insert_tweets.sql', df, 'smi_tweets'):
+                return(None)
+
+        for job_id, user, date_ini, date_end in jobs:
+            self.mark_days_scraped(user, self.window_days(date_ini, date_end))
+            self.complete_job(job_id, worker)
+        return(n_tweets)
+
+    def upsert_to_postgres(self, path, df, table):
         """
-        Function to save dataframe into postgres with copy_from:
+        Function to save dataframe into postgres through a staging table: the dataframe
+        is copied into a temporary table and merged into the target with one query.
         params:
-            - conn: database connection.
-            - df: pandas dataframe.
+            - path: merge query path (INSERT ... SELECT ... ON CONFLICT from {staging}).
+            - df: pandas dataframe, named as the target table columns.
             - table: database table.
+        output: True if the dataframe was merged.
         """
-        #Buffering the dataframe into memory:
-        buffer = StringIO()
-        df.to_csv(buffer, header=False, index=False)
-        buffer.seek(0)
+        staging = 'smi_staging_' + table
         cur = self.conn.cursor()
 
         try:
-            #Copy cached dataframe into postgres:
-            cur.copy_from(buffer, table, sep=",")
+            # Read the staging and merge queries:
+            with open(self.queries_path + 'SMI_staging_table_creation.sql', 'r') as f:
+                staging_query = sql.SQL(f.read()).format(schema=sql.Identifier(self.schema),
+                                                         table=sql.Identifier(table),
+                                                         staging=sql.Identifier(staging))
+            with open(path, 'r') as f:
+                merge_query = sql.SQL(f.read()).format(schema=sql.Identifier(self.schema),
+                                                       staging=sql.Identifier(staging))
+            copy_query = sql.SQL("COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')").format(
+                                                       staging=sql.Identifier(staging),
+                                                       columns=sql.SQL(', ').join(map(sql.Identifier, df.columns)))
+
+            #Buffering the dataframe into memory (empty strings kept, NaN as NULL):
+            buffer = StringIO()
+            df.to_csv(buffer, header=False, index=False, na_rep='\\N')
+            buffer.seek(0)
+
+            #Copy cached dataframe into the staging table and merge it:
+            cur.execute(staging_query)
+            cur.copy_expert(copy_query.as_string(cur), buffer)
+            cur.execute(merge_query)
             self.conn.commit()
+            cur.close()
+            return(True)
 
         except (Exception, psycopg2.DatabaseError) as error:
             self.conn.rollback()
-            cur.close()
             self.api_logger.exception(error)
 
         cur.close()
+        return(False)
 
     def query_SQL(self, path):
         """
@@ -120,6 +450,39 @@ class TweetsPipeline:
 
         cur.close()
 
+    def get_lexicons(self, path, stops, files, artifact = '/lexicons.pkl'):
+        '''
+        Function to load the stopwords, the filtering words and their compiled cleaner from
+        the lexicons artifact, it's compiled again when the source files change.
+        params:
+            - path: route where the stopwords, filtering words and artifact files would be.
+            - stops: list of the files containing stopwords.
+            - files: list of the files containing filtering words.
+            - artifact: name of the compiled lexicons file.
+        output: tuple (stopwords list treated, filtering words list).
+        '''
+        sources = [path + file for file in stops + files]
+        key = ('lexicons', 1, self.ecofilter_mode)
+        payload = load_artifact(path + artifact, sources, key)
+
+        if payload is None:
+            self.api_logger.info('Data job: Compiling lexicons artifact.')
+            stopw = self.get_stops(path, stops)
+            ecolist = self.get_ecofilter(path, files)
+            if stopw is None or ecolist is None:
+                return(stopw, ecolist)
+            payload = (stopw, ecolist, TweetCleaner(stopw, ecolist, self.ecofilter_mode))
+            try:
+                save_artifact(path + artifact, sources, key, payload)
+            except Exception as error:
+                self.api_logger.exception(error)
+        else:
+            self.api_logger.info('Data job: Lexicons loaded from artifact.')
+
+        #The compiled cleaner is reused while these lists are given:
+        self.cleaner = payload
+        return(payload[0], payload[1])
+
     def get_stops(self, path, stops):
         '''
         Function to load and treat stopwords.
@@ -173,32 +536,27 @@ class TweetsPipeline:
         Output: string without accents.
         '''
         try:
-            #Define replacements (possible accents or other special char)
-            replacements = (
-                ("á", "a"),
-                ("é", "e"),
-                ("í", "i"),
-                ("ó", "o"),
-                ("ú", "u"),
-                ("ñ", 'n'),
-                ("à", "a"),
-                ("è", "e"),
-                ("ì", "i"),
-                ("ò", "o"),
-                ("ù", "u"),
-                ("ä", 'a'),
-                ("ë", "e"),
-                ("ï", "i"),
-                ("ö", "o"),
-                ("ü", "u"),
-            )
-            #Replace with tuple:
-            for a, b in replacements:
-                name = name.replace(a, b).replace(a.upper(), b.upper())
-            return(name)
+            #Replace accents (or other special char) with the translation table:
+            return(name.translate(ACCENTS_TABLE))
         except Exception as error:
             self.api_logger.exception(error)
 
+    def get_cleaner(self, stopw, ecol):
+        '''
+        Function to get the tweets cleaner of the stopwords and filtering words lists
+        (matched with the ecofilter mode), it's compiled once and reused while the
+        same lists are given.
+        params:
+            - stopw: stopwords list.
+            - ecol: filtering words list.
+        output: TweetCleaner instance.
+        '''
+        cached = self.cleaner
+        if cached is None or cached[0] is not stopw or cached[1] is not ecol:
+            cached = (stopw, ecol, TweetCleaner(stopw, ecol, self.ecofilter_mode))
+            self.cleaner = cached
+        return(cached[2])
+
     def tweet_cleaner(self, tweet, stopw, ecol):
         '''
         Function to treat the text of a tweet.
@@ -206,42 +564,16 @@ class TweetsPipeline:
             - tweet: the document itself.
         output: the tweet cleaned.
         '''
-        # Remove urls (http in advance)
-        tweet = re.sub(r'http.*',"", tweet)
-        tweet = re.sub(r'pic.twitter\S+', '', tweet)
-        # Remove mentions and hastags.
-        tweet = re.sub(r'#\S+', '', tweet)
-        tweet = re.sub(r'@\S+', '', tweet)
-        # Remove spanish vowel accents.
-        tweet = ' '.join([self.accent_rem(word) for word in tweet.split()])
-        # Remove special characters.
-        tweet = ' '.join(re.sub("(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)"," ", tweet).split())
-        # Lower captions.
-        tweet = tweet.lower()
-        # Remove numbers.
-        tweet = ''.join([i for i in tweet if not i.isdigit()])
-        # Remove white spaces.
-        tweet = re.sub(' +', ' ', tweet)
-        # Remove stopwords.
-        tweet = ' '.join([word for word in tweet.split() if not word in stopw])
-        # Filter words length (<1 and >15).
-        tweet = ' '.join([word for word in tweet.split() if len(word) > 1 and len(word) <= 15])
-        # Filter ecolist.
-        commons = [word for word in ecol if word in tweet]
-        if len(commons) < 1:
-            tweet = ''
-        #if len(tweet) > 1:
-        #   #Lemmatize:
-        #    tweet = ' '.join([tok.lemma_.lower() for tok in nlp(tweet)])
-        return tweet
-
-    def treat_text(self, df, text_col, stopw = [], ecol =[], date_col = 'date', sent_col = 'sentiment'):
+        return self.get_cleaner(stopw, ecol).clean(tweet)
+
+    def treat_text(self, df, text_col, stopw = [], ecol =[], date_col = 'date', sent_col = 'sentiment', terms_col = None):
         '''
         Function to treat text columns:
         params:
             - df: dataframe to treat.
             - text_col: name of the text columns to treat.
             - ecolist
+            - terms_col: name of the column to keep the filtering words found on each text (joined by ', ').
         Output: Dataframe treated.
         '''
         try:
@@ -262,10 +594,17 @@ class TweetsPipeline:
             #Column text treatment:
             self.api_logger.info('Text mining job: Treat text column.')
             df[text_col] = df[text_col].fillna(' ')
-            df[text_col] = df[text_col].apply(lambda r: self.tweet_cleaner(r, stopw, ecol))
+            if terms_col is None:
+                df[text_col] = self.get_cleaner(stopw, ecol).clean_many(df[text_col])
+            else:
+                df[text_col], terms = self.get_cleaner(stopw, ecol).clean_many(df[text_col], terms = True)
+                df[terms_col] = [', '.join(found) for found in terms]
             df = df[df[text_col] != '']
+            if self.lemmatizer is not None and df.shape[0] > 0:
+                self.api_logger.info('Text mining job: Lemmatize text column.')
+                df[text_col] = self.lemmatizer.lemmatize_many(df[text_col])
             if text_col == 'text':
-                df = df[['username', 'date', 'text']]
+                df = df[[col for col in ['id', 'username', 'date', 'text', terms_col] if col in df]]
             df = df.reset_index(drop=True)
             return(df)
             
@@ -273,22 +612,119 @@ class TweetsPipeline:
 
             self.api_logger.exception(error)
 
-    def get_tweets(self, user, date_ini, date_end, stopw, ecolist):
+    def tweet_keys(self, df):
         '''
-        Function to get tweets from a user given a period range.
+        Function to format treated tweets as the tweets table, adding their unique key:
+        the md5 of user, date and text, the same rule of SMI_tweets_key_migration.sql
+        (null values as empty strings), so every tweet has one key whatever its source.
+        params:
+            - df: dataframe with columns 'username', 'date', 'text' and optionally 'ecoterms'.
+        output: dataframe with the tweets table columns.
+        '''
+        dates = ['' if pd.isnull(date) else pd.Timestamp(date).strftime('%Y-%m-%d %H:%M:%S') for date in df['date']]
+        users = ['' if pd.isnull(user) else str(user) for user in df['username']]
+        texts = ['' if pd.isnull(text) else str(text) for text in df['text']]
+        keys = [hashlib.md5('|'.join([user, date, text]).encode('utf-8')).hexdigest() 
+                for user, date, text in zip(users, dates, texts)]
+
+        output = df[['username', 'date', 'text']].rename(columns={'username':'smi_str_username',
+                                                                 'date':'smi_ts_date',
+                                                                 'text':'smi_str_tweet'})
+        output['smi_str_tweetkey'] = keys
+        if 'ecoterms' in df:
+            output['smi_str_ecoterms'] = df['ecoterms']
+        return(output)
+
+    def clean_tweets(self, twts_ls, stopw, ecolist):
+        '''
+        Function to treat a batch of scraped tweets.
+        params:
+            - twts_ls: list of [id, username, date, text] rows.
+        output: dataframe with the treated tweets and their keys.
+        '''
+        df = pd.DataFrame(twts_ls, columns=['id', 'username', 'date', 'text'])
+        df = self.treat_text(df, 'text', stopw, ecolist, date_col = 'date', sent_col = None, terms_col = 'ecoterms')
+        return self.tweet_keys(df)
+
+    def iter_tweets(self, user, date_ini, date_end, stopw, ecolist, max_tweets = None, batch_rows = 500, page_size = 20):
+        '''
+        Generator of the tweets from a user given a period range, treated and yielded by
+        batches as they are scraped, so the window is never held in memory. A window
+        wider than one day whose query returns more than max_tweets results is split
+        in halves (the tweets already yielded are skipped on DB by their unique key).
+        The scrapper pages the results internally, so a request slot of the rate
+        controller is taken before each page (every page_size tweets).
         params:
             - user: twitter user name.
             - date_ini: first day of time window to retrieve tweets.
-            - date_end: last date of time window to retrieve tweets.
+            - date_end: day after the last day of time window to retrieve tweets.
+            - max_tweets: maximum number of results of one query.
+            - batch_rows: maximum number of tweets of each batch.
+            - page_size: number of tweets of each results page of the scrapper.
+        output: dataframes with the treated tweets.
         '''
         # Tweets list:
         twts_ls = []
+        split = max_tweets is not None and len(self.window_days(date_ini, date_end)) > 1
+        overflow = False
 
         # Twitter scrapper:
-        for i, tweet in enumerate(sntwitter.TwitterSearchScraper('from:' + user + ' since:' + date_ini + ' until:' + date_end).get_items()):
-            twts_ls.append([tweet.user.username, tweet.date, tweet.content])
-            
-        # Tweets dataframe: 
-        df = pd.DataFrame(twts_ls, columns=['username', 'date', 'text'])
-        df = self.treat_text(df, 'text', stopw, ecolist, date_col = 'date', sent_col = None)
-        return df
\ No newline at end of file
+        items = sntwitter.TwitterSearchScraper('from:' + user + ' since:' + date_ini + ' until:' + date_end).get_items()
+        i, latency = 0, None
+        start = time.monotonic()
+        try:
+            while True:
+                # Wait for the next request slot of the rate controller before each results page,
+                # reporting the latency of the previous page:
+                if self.rate is not None and i % page_size == 0:
+                    if i > 0:
+                        self.rate.success(latency)
+                    self.rate.acquire()
+                    start, latency = time.monotonic(), None
+                tweet = next(items, None)
+                if latency is None:
+                    latency = time.monotonic() - start
+                if tweet is None:
+                    break
+                if split and i >= max_tweets:
+                    overflow = True
+                    break
+                twts_ls.append([tweet.id, tweet.user.username, tweet.date, tweet.content])
+                i += 1
+                if len(twts_ls) >= batch_rows:
+                    yield self.clean_tweets(twts_ls, stopw, ecolist)
+                    twts_ls = []
+        except Exception as error:
+            if self.rate is not None:
+                self.rate.failure(error)
+            raise
+
+        if self.rate is not None:
+            self.rate.success(latency)
+        if len(twts_ls) > 0:
+            yield self.clean_tweets(twts_ls, stopw, ecolist)
+
+        # Split the window in halves while it returns too many tweets:
+        if overflow:
+            days = self.window_days(date_ini, date_end)
+            date_mid = days[len(days) // 2]
+            self.api_logger.info('Scrapping job: Too many tweets from ' + date_ini + ' to ' + date_end + ', splitting window on ' + date_mid + '.')
+            for df in self.iter_tweets(user, date_ini, date_mid, stopw, ecolist, max_tweets, batch_rows, page_size):
+                yield df
+            for df in self.iter_tweets(user, date_mid, date_end, stopw, ecolist, max_tweets, batch_rows, page_size):
+                yield df
+
+    def get_tweets(self, user, date_ini, date_end, stopw, ecolist, max_tweets = None):
+        '''
+        Function to get tweets from a user given a period range.
+        params:
+            - user: twitter user name.
+            - date_ini: first day of time window to retrieve tweets.
+            - date_end: day after the last day of time window to retrieve tweets.
+            - max_tweets: maximum number of results of one query.
+        output: dataframe with the tweets of the whole window treated.
+        '''
+        dfs = list(self.iter_tweets(user, date_ini, date_end, stopw, ecolist, max_tweets))
+        if len(dfs) == 0:
+            return self.clean_tweets([], stopw, ecolist)
+        return pd.concat(dfs, axis=0).reset_index(drop=True)